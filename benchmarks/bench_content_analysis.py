@@ -0,0 +1,113 @@
+"""
+Content analysis benchmark
+Feeds messages of growing size and volume through content analysis inline and through the
+worker pool, and reports how late the event loop runs while it happens
+
+Usage: python -m benchmarks.bench_content_analysis [--sizes 500,1000,2000,4000] [--rates 200,1000,3000]
+                                                   [--duration S] [--executor process|thread]
+"""
+
+import argparse
+import asyncio
+import random
+from typing import List, Tuple
+
+import config
+from benchmarks.loadtest import percentile
+from utils.content_analysis import ContentAnalyzer
+
+WORDS = ["raid", "city", "netanya", "free", "nitro", "click", "here", "hello", "everyone", "join", "server", "now"]
+
+def make_message(size: int, rng: random.Random) -> str:
+    """Chat-like content of roughly `size` characters with the odd link and mention"""
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        roll = rng.random()
+        if roll < 0.02:
+            word = f"https://example.com/{rng.randrange(10 ** 6)}"
+        elif roll < 0.04:
+            word = f"<@{rng.randrange(10 ** 17, 10 ** 18)}>"
+        else:
+            word = rng.choice(WORDS).upper() if roll > 0.97 else rng.choice(WORDS)
+        parts.append(word)
+        length += len(word) + 1
+    return " ".join(parts)[:size]
+
+async def sample_lag(stop: asyncio.Event, lags: List[float], interval: float = 0.001) -> None:
+    """Record how late the loop wakes a task that asks to sleep for `interval`"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - started - interval, 0.0))
+
+async def run_case(analyzer: ContentAnalyzer, messages: List[str], rate: int, duration: float) -> Tuple[float, float, float]:
+    """
+    Deliver `rate` messages per second for `duration` seconds, one task per message like gateway events
+
+    Returns:
+        Tuple[float, float, float]: (p99 loop lag ms, max loop lag ms, seconds until every message was analyzed)
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    lags: List[float] = []
+    sampler = asyncio.create_task(sample_lag(stop, lags))
+    await asyncio.sleep(0.01)
+
+    tick = 0.005
+    per_tick = max(1, round(rate * tick))
+    tasks = []
+    started = loop.time()
+    index = 0
+    while loop.time() - started < duration:
+        for _ in range(per_tick):
+            tasks.append(asyncio.create_task(analyzer.analyze(messages[index % len(messages)])))
+            index += 1
+        await asyncio.sleep(tick)
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+
+    stop.set()
+    await sampler
+    return percentile(lags, 99) * 1000, max(lags, default=0.0) * 1000, elapsed
+
+async def main_async(args) -> None:
+    rng = random.Random(1)
+    settings = dict(config.CONTENT_ANALYSIS, EXECUTOR=args.executor, TIMEOUT=60.0, QUEUE_LIMIT=10 ** 6)
+    inline = ContentAnalyzer(settings)  # never started: every message takes the inline path
+    pooled = ContentAnalyzer(settings)
+    pooled.start()
+    await asyncio.sleep(0.5)  # let the workers come up
+
+    print(f"fast path <= {settings['FAST_PATH_CHARS']} chars inline; longer messages to a "
+          f"{settings['WORKERS']}-worker {args.executor} pool; {args.duration:g}s per case")
+    print(f"{'size':>7} {'msg/s':>6} | {'inline p99/max lag ms':>22} | {'pool p99/max lag ms':>20} {'pool done s':>11}")
+    try:
+        for size in args.sizes:
+            messages = [make_message(size, rng) for _ in range(64)]
+            for rate in args.rates:
+                inline_p99, inline_max, _ = await run_case(inline, messages, rate, args.duration)
+                pool_p99, pool_max, pool_done = await run_case(pooled, messages, rate, args.duration)
+                print(f"{size:>7} {rate:>6} | {inline_p99:>10.1f} / {inline_max:>9.1f} | "
+                      f"{pool_p99:>9.1f} / {pool_max:>8.1f} {pool_done:>11.2f}")
+    finally:
+        pooled.stop()
+    stats = pooled.get_stats()
+    print(f"pool: {stats['offloaded']} offloaded in {stats['batches']} batches "
+          f"({stats['avg_batch']:.1f} per batch), {stats['inline']} inline")
+
+def main():
+    parser = argparse.ArgumentParser(description="Content analysis benchmark")
+    # Discord caps messages at 2000 characters (4000 with Nitro)
+    parser.add_argument("--sizes", default="500,1000,2000,4000", help="message sizes in characters")
+    parser.add_argument("--rates", default="200,1000,3000", help="messages per second")
+    parser.add_argument("--duration", type=float, default=1.0, help="seconds per case")
+    parser.add_argument("--executor", choices=["process", "thread"], default=config.CONTENT_ANALYSIS["EXECUTOR"])
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    args.rates = [int(rate) for rate in args.rates.split(",")]
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Channel router benchmark
+Compares the per-message cost of the old "check everything" path with channel routing
+
+Usage: python -m benchmarks.bench_event_router [--messages N]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from utils.dos_protection import is_spam_detected, is_command_rate_limited, rate_limit_storage, spam_storage
+from utils.event_router import ChannelRouter, SPAM_CHECK, COMMAND_LIMIT
+from utils.guild_config import guild_config
+
+GUILD_ID = 1
+USERS = 5000
+
+def make_channel(channel_id: int, name: str) -> SimpleNamespace:
+    """Build a minimal stand-in for a guild text channel"""
+    return SimpleNamespace(id=channel_id, name=name, category=None, guild=SimpleNamespace(id=GUILD_ID))
+
+def make_messages(channel: SimpleNamespace, count: int) -> list:
+    """Build chat messages spread across many users"""
+    return [
+        SimpleNamespace(
+            channel=channel,
+            guild=channel.guild,
+            author=SimpleNamespace(id=i % USERS, bot=False),
+            content=f"message {i}",
+        )
+        for i in range(count)
+    ]
+
+def reset_storage() -> None:
+    """Start every run with empty protection state"""
+    rate_limit_storage.clear()
+    spam_storage.clear()
+
+def legacy_path(message) -> None:
+    """Pre-routing on_message work: every check for every message"""
+    guild_id = message.guild.id
+    if is_spam_detected(message.author.id, message.content, guild_id):
+        return
+    if is_command_rate_limited(message.author.id, guild_id):
+        return
+    _ = "city-selection" in message.channel.name
+
+def routed_path(router: ChannelRouter, message) -> None:
+    """Routed on_message work: only the subsystems the channel needs"""
+    started = time.perf_counter()
+    subsystems = router.route(message)
+    if not subsystems:
+        router.record(subsystems, started)
+        return
+    guild_id = message.guild.id
+    spam = SPAM_CHECK in subsystems and is_spam_detected(message.author.id, message.content, guild_id)
+    if not spam and COMMAND_LIMIT in subsystems:
+        is_command_rate_limited(message.author.id, guild_id)
+    router.record(subsystems, started)
+
+def run(label: str, handler, messages: list) -> None:
+    """Time a handler over a message batch and print throughput"""
+    reset_storage()
+    started = time.perf_counter()
+    for message in messages:
+        handler(message)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {len(messages) / elapsed:>12,.0f} msg/s {elapsed / len(messages) * 1e6:>8.2f} us/msg")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000, help="messages per scenario")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        guild_config.db_path = os.path.join(tmp, "guild_config.db")
+        router = ChannelRouter()
+
+        general = make_channel(10, "general")
+        ignored = make_channel(11, "announcements")
+        city = make_channel(12, "city-selection")
+        guild_config.set_channel_route(GUILD_ID, ignored.id, [])
+        for channel in (general, ignored, city):
+            router.update_channel(channel)
+
+        run("legacy (every check)", legacy_path, make_messages(ignored, args.messages))
+        run("routed: ignored channel", lambda m: routed_path(router, m), make_messages(ignored, args.messages))
+        run("routed: general (spam only)", lambda m: routed_path(router, m), make_messages(general, args.messages))
+        run("routed: city-selection (all)", lambda m: routed_path(router, m), make_messages(city, args.messages))
+
+        print()
+        for key, value in router.get_stats().items():
+            print(f"{key:<20} {value:,.2f}" if isinstance(value, float) else f"{key:<20} {value}")
+
+if __name__ == "__main__":
+    main()
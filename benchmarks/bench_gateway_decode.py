@@ -0,0 +1,119 @@
+"""
+Gateway decode benchmark
+Measures gateway events decoded per second (zlib-stream decompression plus JSON parsing) with
+stock discord.py and with the speed runtime profile
+
+Usage: python -m benchmarks.bench_gateway_decode [--events N] [--rounds N]
+"""
+
+import argparse
+import json
+import time
+import zlib
+from typing import Any, Callable, List, Optional, Tuple
+
+import discord
+
+from utils.runtime_profile import FastZlibDecompressionContext, json_backends
+
+GUILD_ID = "500"
+
+def message_create(index: int) -> dict:
+    """A MESSAGE_CREATE dispatch shaped like Discord's, member object included"""
+    return {
+        "op": 0, "s": index, "t": "MESSAGE_CREATE",
+        "d": {
+            "id": str(10 ** 17 + index), "channel_id": str(600 + index % 7), "guild_id": GUILD_ID, "type": 0,
+            "content": f"message number {index} " + "lorem ipsum dolor sit amet " * (index % 5),
+            "author": {"id": str(10_000 + index % 500), "username": f"user{index % 500}", "discriminator": "0",
+                       "global_name": f"User {index % 500}", "avatar": "a" * 32, "public_flags": 0},
+            "member": {"roles": [str(700 + role) for role in range(index % 6)], "joined_at": "2024-01-01T00:00:00+00:00",
+                       "deaf": False, "mute": False, "flags": 0, "nick": None, "avatar": None},
+            "timestamp": "2026-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [],
+            "pinned": False, "nonce": str(index), "flags": 0, "components": [],
+        },
+    }
+
+def member_update(index: int) -> dict:
+    """A GUILD_MEMBER_UPDATE dispatch"""
+    return {
+        "op": 0, "s": index, "t": "GUILD_MEMBER_UPDATE",
+        "d": {
+            "guild_id": GUILD_ID, "roles": [str(700 + role) for role in range(index % 8)],
+            "user": {"id": str(10_000 + index % 500), "username": f"user{index % 500}", "discriminator": "0",
+                     "global_name": None, "avatar": None},
+            "nick": None, "joined_at": "2024-01-01T00:00:00+00:00", "premium_since": None,
+            "pending": False, "communication_disabled_until": None, "flags": 0,
+        },
+    }
+
+def build_frames(count: int) -> List[bytes]:
+    """
+    Compress events the way the gateway does: one zlib stream, each message ending in a
+    Z_SYNC_FLUSH. Every 50th message is split across two frames.
+    """
+    compressor = zlib.compressobj()
+    frames = []
+    for index in range(count):
+        event = member_update(index) if index % 4 == 3 else message_create(index)
+        data = compressor.compress(json.dumps(event).encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if index % 50 == 49 and len(data) > 8:
+            frames.extend([data[:len(data) // 2], data[len(data) // 2:]])
+        else:
+            frames.append(data)
+    return frames
+
+def decode_all(frames: List[bytes], context_class: type, loads: Callable[[Any], Any]) -> Tuple[float, int]:
+    """Decode every frame with a fresh stream context; returns (seconds, events decoded)"""
+    context = context_class()
+    decoded = 0
+    started = time.perf_counter()
+    for frame in frames:
+        message = context.decompress(frame)
+        if message is None:
+            continue
+        loads(message)
+        decoded += 1
+    return time.perf_counter() - started, decoded
+
+def fast_json() -> Tuple[str, Callable[[Any], Any]]:
+    """The JSON backend the speed profile would pick here"""
+    for name, load in json_backends():
+        try:
+            return name, load()[0]
+        except ImportError:
+            continue
+    return "json", json.loads
+
+def main():
+    parser = argparse.ArgumentParser(description="Gateway decode benchmark")
+    parser.add_argument("--events", type=int, default=50_000, help="gateway events per round")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds per variant (best is reported)")
+    args = parser.parse_args()
+
+    stock_context: Optional[type] = getattr(discord.utils, "_ZlibDecompressionContext", None)
+    if stock_context is None:
+        print("discord.py negotiates zstd-stream here (zstandard is installed); zlib-stream tuning does not apply")
+        return
+
+    frames = build_frames(args.events)
+    json_name, json_loads = fast_json()
+    default_json = "orjson" if discord.utils.HAS_ORJSON else "json"
+    variants = [
+        ("stdlib (json, stock zlib)", stock_context, json.loads),
+        (f"discord.py default ({default_json}, stock zlib)", stock_context, discord.utils._from_json),
+        (f"speed profile ({json_name}, tuned zlib)", FastZlibDecompressionContext, json_loads),
+    ]
+
+    size = sum(len(frame) for frame in frames)
+    print(f"{args.events} events in {len(frames)} frames ({size / 1024:.0f} KiB compressed), best of {args.rounds}")
+    baseline = None
+    for name, context_class, loads in variants:
+        seconds, decoded = min(decode_all(frames, context_class, loads) for _ in range(args.rounds))
+        rate = decoded / seconds
+        baseline = baseline or rate
+        print(f"  {name:<40} {rate:>10,.0f} events/s  ({rate / baseline:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Raid detection benchmark
+Runs a cross-account raid (500 fresh accounts each posting the same link twice) through the raid
+detector in the middle of steady background chat, and reports how much of the raid is flagged
+and how much ordinary chat is flagged by mistake at each background rate
+
+Usage: python -m benchmarks.bench_raid_detection [--rates 1000,3000,6000,12000] [--minutes N]
+                                                 [--raiders N] [--raid-seconds S]
+"""
+
+import argparse
+import logging
+import random
+import time
+from typing import Iterator, List, Tuple
+
+from utils.raid_detection import RaidDetector
+
+GUILD_ID = 1
+CHANNELS = 20
+USERS = 5000
+RAID_TEXT = "FREE NITRO for everyone https://dlscord-gift.example/claim"
+
+def background(rate: int, minutes: float, rng: random.Random) -> Iterator[Tuple[float, int, int, str]]:
+    """Ordinary chat: `rate` messages per minute from many users, every message different"""
+    interval = 60.0 / rate
+    for index in range(int(rate * minutes)):
+        author = rng.randrange(USERS)
+        yield index * interval, rng.randrange(CHANNELS), author, f"user {author} says something about topic {index}"
+
+def raid(start: float, raiders: int, seconds: float, rng: random.Random) -> List[Tuple[float, int, int, str]]:
+    """Each raider posts the raid message twice, spread over `seconds` starting at `start`"""
+    events = []
+    for raider in range(raiders):
+        author = 10 ** 9 + raider
+        for _ in range(2):
+            events.append((start + rng.random() * seconds, rng.randrange(CHANNELS), author, RAID_TEXT))
+    return events
+
+def run_case(rate: int, args) -> Tuple[int, int, int, int, float]:
+    """
+    Replay background chat with the raid starting halfway through, mid-window
+
+    Returns:
+        Tuple[int, int, int, int, float]: (raid messages flagged, raid messages, background messages flagged,
+                                          background messages, microseconds per message)
+    """
+    rng = random.Random(rate)
+    detector = RaidDetector()
+    raid_start = args.minutes * 30 + detector.settings["WINDOW"] / 2
+    events = [(at, channel, author, text, False) for at, channel, author, text in background(rate, args.minutes, rng)]
+    events += [(at, channel, author, text, True) for at, channel, author, text in raid(raid_start, args.raiders, args.raid_seconds, rng)]
+    events.sort()
+
+    raid_flagged = chat_flagged = raid_total = 0
+    started = time.perf_counter()
+    for at, channel, author, text, is_raid in events:
+        verdict = detector.observe(GUILD_ID, channel, author, text, now=at)
+        if is_raid:
+            raid_total += 1
+            raid_flagged += verdict.flagged
+        else:
+            chat_flagged += verdict.flagged
+    elapsed = time.perf_counter() - started
+    return raid_flagged, raid_total, chat_flagged, len(events) - raid_total, elapsed / len(events) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Raid detection benchmark")
+    parser.add_argument("--rates", default="1000,3000,6000,12000", help="background messages per minute")
+    parser.add_argument("--minutes", type=float, default=5.0, help="minutes of background chat")
+    parser.add_argument("--raiders", type=int, default=500, help="raid accounts (two messages each)")
+    parser.add_argument("--raid-seconds", type=float, default=30.0, help="how long the raid lasts")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{args.raiders} accounts x 2 messages over {args.raid_seconds:g}s, starting mid-window after "
+          f"{args.minutes / 2:g} of {args.minutes:g} minutes of chat")
+    print(f"{'chat/min':>8} | {'raid flagged':>16} | {'chat flagged':>16} | {'us/msg':>6}")
+    for rate in (int(rate) for rate in args.rates.split(",")):
+        raid_flagged, raid_total, chat_flagged, chat_total, per_message = run_case(rate, args)
+        print(f"{rate:>8} | {raid_flagged:>6} / {raid_total:<7} | {chat_flagged:>6} / {chat_total:<7} | {per_message:>6.1f}")
+
+if __name__ == "__main__":
+    main()
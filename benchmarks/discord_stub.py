@@ -0,0 +1,369 @@
+"""
+Local Discord REST/gateway stand-in for load testing
+Serves the REST routes the bot uses with configurable latency and Discord-style 429 buckets,
+and pushes GUILD_MEMBER_UPDATE events back to listeners when member roles change
+"""
+
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v10"
+
+# Route name -> (requests, per seconds). Buckets are keyed by the route's major parameter
+# (guild or channel ID), like Discord's. Numbers approximate what Discord hands out to bots.
+DEFAULT_BUCKETS: Dict[str, Tuple[int, float]] = {
+    "member_role": (10, 10.0),
+    "member_edit": (10, 10.0),
+    "message_send": (5, 5.0),
+    "message_delete": (5, 1.0),
+    "bulk_delete": (1, 1.0),
+    "channel_edit": (5, 5.0),
+}
+
+# Requests per second across every route
+DEFAULT_GLOBAL_LIMIT = 50
+
+@dataclass
+class RateLimitBucket:
+    """Fixed-window bucket mirroring Discord's X-RateLimit-* semantics"""
+    limit: int
+    window: float
+    remaining: int = 0
+    reset_at: float = 0.0
+
+    def acquire(self, now: float) -> Optional[float]:
+        """Take a request slot. Returns None on success, or seconds to wait when exhausted"""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        if self.remaining <= 0:
+            return self.reset_at - now
+        self.remaining -= 1
+        return None
+
+@dataclass
+class RoleEvent:
+    """A role change the bot made through the REST API"""
+    at: float
+    guild_id: int
+    user_id: int
+    role_id: int
+    added: bool
+
+@dataclass
+class StubStats:
+    """Counters collected while the stub is serving"""
+    calls: Counter = field(default_factory=Counter)
+    rate_limited: Counter = field(default_factory=Counter)
+    role_events: List[RoleEvent] = field(default_factory=list)
+
+def snowflake_timestamp() -> str:
+    """Current time in the ISO format Discord uses"""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def user_payload(user_id: int, name: str, bot: bool = False) -> dict:
+    """Build a Discord user object"""
+    return {"id": str(user_id), "username": name, "discriminator": "0", "global_name": name, "avatar": None, "bot": bot}
+
+def member_payload(user: dict, role_ids: Set[int]) -> dict:
+    """Build a Discord guild member object"""
+    return {
+        "user": user,
+        "roles": [str(role_id) for role_id in sorted(role_ids)],
+        "joined_at": snowflake_timestamp(),
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+def message_payload(message_id: int, channel_id: int, guild_id: Optional[int], author: dict, content: str) -> dict:
+    """Build a Discord message object"""
+    data = {
+        "id": str(message_id),
+        "channel_id": str(channel_id),
+        "type": 0,
+        "content": content,
+        "author": author,
+        "timestamp": snowflake_timestamp(),
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+    }
+    if guild_id is not None:
+        data["guild_id"] = str(guild_id)
+    return data
+
+def json_response(data: dict, status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    """JSON response with the bare content type discord.py checks for (no charset suffix)"""
+    headers = {**(headers or {}), "Content-Type": "application/json"}
+    return web.Response(body=json.dumps(data).encode(), status=status, headers=headers)
+
+class DiscordStub:
+    """In-process aiohttp server that mimics the parts of Discord the bot talks to"""
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        event_latency: float = 0.02,
+        buckets: Optional[Dict[str, Tuple[int, float]]] = None,
+        global_limit: Optional[int] = DEFAULT_GLOBAL_LIMIT,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.event_latency = event_latency
+        self.bucket_specs = DEFAULT_BUCKETS if buckets is None else buckets
+        self.global_limit = global_limit
+        self.stats = StubStats()
+        self.bot_user = user_payload(1, "SGeBot", bot=True)
+        self.users: Dict[int, dict] = {}
+        self.member_roles: Dict[Tuple[int, int], Set[int]] = {}
+        self.channels: Dict[int, dict] = {}
+        self.member_listeners: List[Callable[[dict], None]] = []
+        self._buckets: Dict[Tuple[str, str], RateLimitBucket] = {}
+        self._global_bucket = RateLimitBucket(global_limit, 1.0) if global_limit else None
+        self._ids = itertools.count(10 ** 17)
+        self._runner: Optional[web.AppRunner] = None
+
+        app = web.Application()
+        app.add_routes([
+            web.get(f"{API_PREFIX}/users/@me", self.get_current_user),
+            web.get(f"{API_PREFIX}/oauth2/applications/@me", self.get_application),
+            web.put(f"{API_PREFIX}/guilds/{{guild_id}}/members/{{user_id}}/roles/{{role_id}}", self.add_member_role),
+            web.delete(f"{API_PREFIX}/guilds/{{guild_id}}/members/{{user_id}}/roles/{{role_id}}", self.remove_member_role),
+            web.patch(f"{API_PREFIX}/guilds/{{guild_id}}/members/{{user_id}}", self.edit_member),
+            web.post(f"{API_PREFIX}/channels/{{channel_id}}/messages/bulk-delete", self.bulk_delete_messages),
+            web.post(f"{API_PREFIX}/channels/{{channel_id}}/messages", self.send_message),
+            web.delete(f"{API_PREFIX}/channels/{{channel_id}}/messages/{{message_id}}", self.delete_message),
+            web.patch(f"{API_PREFIX}/channels/{{channel_id}}", self.edit_channel),
+            web.route("*", "/{tail:.*}", self.unhandled),
+        ])
+        self.app = app
+
+    def next_id(self) -> int:
+        """Generate a new snowflake-sized ID"""
+        return next(self._ids)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL (without the API prefix)"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        sockets = site._server.sockets  # type: ignore[union-attr]
+        bound_port = sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self) -> None:
+        """Stop serving"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # --- Member state -------------------------------------------------------
+
+    def add_member(self, guild_id: int, user: dict, role_ids: Set[int]) -> None:
+        """Seed a guild member"""
+        user_id = int(user["id"])
+        self.users[user_id] = user
+        self.member_roles[(guild_id, user_id)] = set(role_ids)
+
+    def add_channel(self, guild_id: int, channel: dict) -> None:
+        """Seed a guild channel so edits (e.g. raid-mode slowmode) can be answered"""
+        self.channels[int(channel["id"])] = {**channel, "guild_id": str(guild_id)}
+
+    def apply_external_role_change(self, guild_id: int, user_id: int, add: Set[int] = frozenset(), remove: Set[int] = frozenset()) -> None:
+        """Change roles as a moderator would from their own client (not counted as a bot call)"""
+        roles = self.member_roles.setdefault((guild_id, user_id), set())
+        roles |= set(add)
+        roles -= set(remove)
+        self._emit_member_update(guild_id, user_id)
+
+    def _emit_member_update(self, guild_id: int, user_id: int) -> None:
+        """Push a GUILD_MEMBER_UPDATE to listeners after the simulated gateway delay"""
+        payload = member_payload(self.users[user_id], self.member_roles[(guild_id, user_id)])
+        payload["guild_id"] = str(guild_id)
+        loop = asyncio.get_running_loop()
+        for listener in self.member_listeners:
+            loop.call_later(self.event_latency, listener, payload)
+
+    # --- Request plumbing ---------------------------------------------------
+
+    async def _admit(self, route: str, major: str) -> Tuple[Optional[web.Response], Dict[str, str]]:
+        """Apply latency and rate limits. Returns a 429 response if rejected, plus the bucket headers"""
+        self.stats.calls[route] += 1
+        delay = self.latency + random.uniform(0, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        now = asyncio.get_running_loop().time()
+        if self._global_bucket is not None:
+            retry_after = self._global_bucket.acquire(now)
+            if retry_after is not None:
+                self.stats.rate_limited["global"] += 1
+                return self._too_many_requests(retry_after, is_global=True), {}
+
+        spec = self.bucket_specs.get(route)
+        if spec is None:
+            return None, {}
+        bucket = self._buckets.get((route, major))
+        if bucket is None:
+            bucket = self._buckets[(route, major)] = RateLimitBucket(*spec)
+        retry_after = bucket.acquire(now)
+        if retry_after is not None:
+            self.stats.rate_limited[route] += 1
+            return self._too_many_requests(retry_after, bucket=route), {}
+        headers = {
+            "X-RateLimit-Limit": str(bucket.limit),
+            "X-RateLimit-Remaining": str(bucket.remaining),
+            "X-RateLimit-Reset-After": f"{max(bucket.reset_at - now, 0):.3f}",
+            "X-RateLimit-Bucket": route,
+        }
+        return None, headers
+
+    def _too_many_requests(self, retry_after: float, is_global: bool = False, bucket: str = "") -> web.Response:
+        """Build a Discord-style 429"""
+        headers = {
+            "Via": "1.1 discord-stub",
+            "Retry-After": f"{retry_after:.3f}",
+            "X-RateLimit-Scope": "global" if is_global else "user",
+        }
+        if is_global:
+            headers["X-RateLimit-Global"] = "true"
+        else:
+            headers.update({
+                "X-RateLimit-Limit": "0",
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset-After": f"{retry_after:.3f}",
+                "X-RateLimit-Bucket": bucket,
+            })
+        body = {"message": "You are being rate limited.", "retry_after": retry_after, "global": is_global}
+        return json_response(body, status=429, headers=headers)
+
+    def _ok(self, headers: Dict[str, str], data: Optional[dict] = None) -> web.Response:
+        """Build a success response carrying the bucket headers from _admit"""
+        if data is None:
+            return web.Response(status=204, headers=headers)
+        return json_response(data, headers=headers)
+
+    # --- Handlers -----------------------------------------------------------
+
+    async def get_current_user(self, request: web.Request) -> web.Response:
+        return json_response(self.bot_user)
+
+    async def get_application(self, request: web.Request) -> web.Response:
+        return json_response({
+            "id": self.bot_user["id"],
+            "name": self.bot_user["username"],
+            "description": "",
+            "icon": None,
+            "bot_public": False,
+            "bot_require_code_grant": False,
+            "owner": user_payload(2, "owner"),
+            "verify_key": "",
+            "flags": 0,
+        })
+
+    async def _change_role(self, request: web.Request, added: bool) -> web.Response:
+        guild_id = int(request.match_info["guild_id"])
+        user_id = int(request.match_info["user_id"])
+        role_id = int(request.match_info["role_id"])
+        rejected, headers = await self._admit("member_role", str(guild_id))
+        if rejected is not None:
+            return rejected
+        roles = self.member_roles.setdefault((guild_id, user_id), set())
+        if added:
+            roles.add(role_id)
+        else:
+            roles.discard(role_id)
+        self.stats.role_events.append(RoleEvent(asyncio.get_running_loop().time(), guild_id, user_id, role_id, added))
+        response = self._ok(headers)
+        if user_id in self.users:
+            self._emit_member_update(guild_id, user_id)
+        return response
+
+    async def add_member_role(self, request: web.Request) -> web.Response:
+        return await self._change_role(request, added=True)
+
+    async def remove_member_role(self, request: web.Request) -> web.Response:
+        return await self._change_role(request, added=False)
+
+    async def edit_member(self, request: web.Request) -> web.Response:
+        guild_id = int(request.match_info["guild_id"])
+        user_id = int(request.match_info["user_id"])
+        rejected, headers = await self._admit("member_edit", str(guild_id))
+        if rejected is not None:
+            return rejected
+        body = await request.json()
+        if "roles" in body:
+            now = asyncio.get_running_loop().time()
+            old = self.member_roles.get((guild_id, user_id), set())
+            new = {int(role_id) for role_id in body["roles"]}
+            for role_id in new - old:
+                self.stats.role_events.append(RoleEvent(now, guild_id, user_id, role_id, True))
+            for role_id in old - new:
+                self.stats.role_events.append(RoleEvent(now, guild_id, user_id, role_id, False))
+            self.member_roles[(guild_id, user_id)] = new
+        user = self.users.get(user_id, user_payload(user_id, f"user{user_id}"))
+        response = self._ok(headers, member_payload(user, self.member_roles.get((guild_id, user_id), set())))
+        if user_id in self.users:
+            self._emit_member_update(guild_id, user_id)
+        return response
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info["channel_id"])
+        rejected, headers = await self._admit("message_send", str(channel_id))
+        if rejected is not None:
+            return rejected
+        if request.content_type == "application/json":
+            body = await request.json()
+        else:
+            form = await request.post()
+            body = json.loads(form.get("payload_json", "{}"))
+        return self._ok(headers, message_payload(self.next_id(), channel_id, None, self.bot_user, body.get("content") or ""))
+
+    async def delete_message(self, request: web.Request) -> web.Response:
+        channel_id = request.match_info["channel_id"]
+        rejected, headers = await self._admit("message_delete", channel_id)
+        if rejected is not None:
+            return rejected
+        return self._ok(headers)
+
+    async def bulk_delete_messages(self, request: web.Request) -> web.Response:
+        channel_id = request.match_info["channel_id"]
+        rejected, headers = await self._admit("bulk_delete", channel_id)
+        if rejected is not None:
+            return rejected
+        return self._ok(headers)
+
+    async def edit_channel(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info["channel_id"])
+        rejected, headers = await self._admit("channel_edit", str(channel_id))
+        if rejected is not None:
+            return rejected
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            return json_response({"message": "Unknown Channel", "code": 10003}, status=404)
+        channel.update(await request.json())
+        return self._ok(headers, channel)
+
+    async def unhandled(self, request: web.Request) -> web.Response:
+        self.stats.calls[f"unhandled {request.method} {request.path}"] += 1
+        logger.warning(f"Discord stub has no route for {request.method} {request.path}")
+        return json_response({"message": "Unknown route", "code": 0}, status=404)
@@ -0,0 +1,261 @@
+"""
+End-to-end load test against the local Discord stand-in
+Connects SGeBot to benchmarks.discord_stub, replays city-pick storms and mass role changes,
+and reports role-assignment throughput, tail latency and API calls per user action
+
+Usage: python -m benchmarks.loadtest [--users N] [--scenario city-storm|role-storm|all]
+                                     [--latency S] [--jitter S] [--no-ratelimits]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+from collections import Counter
+from typing import Dict, List
+
+import discord
+
+import config
+from bot import SGeBot
+from benchmarks.discord_stub import API_PREFIX, DiscordStub, message_payload, member_payload, user_payload
+
+GUILD_ID = 500
+FIRST_USER_ID = 10_000
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class LoadTest:
+    """Wires an SGeBot to a DiscordStub and drives scenarios through it"""
+
+    def __init__(self, stub: DiscordStub, users: int):
+        self.stub = stub
+        self.user_count = users
+        self.bot = None
+        self.guild = None
+        self.role_ids: Dict[str, int] = {}
+        self.channel_ids: Dict[str, int] = {}
+        self.user_ids = [FIRST_USER_ID + i for i in range(users)]
+
+    def build_guild_payload(self) -> dict:
+        """Build a guild with every role and channel the cogs look for"""
+        role_names = (
+            set(config.CITY_ROLES.values()) | config.COUNTRY_ROLES | config.LEADER_ROLES
+            | config.LOCATIONS | {f"{loc} Leader" for loc in config.LOCATIONS}
+        )
+        roles = [{"id": str(GUILD_ID), "name": "@everyone", "permissions": "0", "position": 0,
+                  "color": 0, "hoist": False, "managed": False, "mentionable": False}]
+        for position, name in enumerate(sorted(role_names), start=1):
+            role_id = self.stub.next_id()
+            self.role_ids[name] = role_id
+            roles.append({"id": str(role_id), "name": name, "permissions": "0", "position": position,
+                          "color": 0, "hoist": False, "managed": False, "mentionable": False})
+
+        category_id = self.stub.next_id()
+        channels = [{"id": str(category_id), "type": 4, "name": config.UNRECOGNIZED_CITY_CATEGORY,
+                     "position": 0, "permission_overwrites": []}]
+        for position, name in enumerate(["city-selection", "general", config.UNRECOGNIZED_CITY_CHANNEL], start=1):
+            channel_id = self.stub.next_id()
+            self.channel_ids[name] = channel_id
+            channels.append({"id": str(channel_id), "type": 0, "name": name, "position": position,
+                             "permission_overwrites": [], "parent_id": str(category_id)})
+        for channel in channels:
+            self.stub.add_channel(GUILD_ID, channel)
+
+        # Every member starts in one location so that a leader role produces a combo role
+        locations = sorted(config.LOCATIONS)
+        members = []
+        for index, user_id in enumerate(self.user_ids):
+            user = user_payload(user_id, f"user{user_id}")
+            role_ids = {self.role_ids[locations[index % len(locations)]]}
+            self.stub.add_member(GUILD_ID, user, role_ids)
+            members.append(member_payload(user, role_ids))
+        members.append(member_payload(self.stub.bot_user, set()))
+
+        return {
+            "id": str(GUILD_ID), "name": "Load Test", "owner_id": "2", "roles": roles, "channels": channels,
+            "members": members, "member_count": len(members), "features": [], "emojis": [], "stickers": [],
+            "icon": None, "splash": None, "discovery_splash": None, "banner": None,
+            "verification_level": 0, "default_message_notifications": 0, "explicit_content_filter": 0,
+            "mfa_level": 0, "premium_tier": 0, "afk_timeout": 300, "system_channel_flags": 0,
+        }
+
+    async def setup(self) -> None:
+        """Log the bot into the stub and hand it the synthetic guild"""
+        from utils.event_router import channel_router
+
+        self.bot = SGeBot()
+        await self.bot.login("stub-token")
+
+        state = self.bot._connection
+        self.guild = discord.Guild(data=self.build_guild_payload(), state=state)
+        state._add_guild(self.guild)
+        channel_router.rebuild(self.bot.guilds)
+
+        # Gateway stand-in: role changes made through the stub come back as GUILD_MEMBER_UPDATE
+        self.stub.member_listeners.append(state.parse_guild_member_update)
+
+    async def teardown(self) -> None:
+        """Cancel leftover delete_after tasks and close the bot"""
+        current = asyncio.current_task()
+        for task in asyncio.all_tasks():
+            if task is not current and not task.done():
+                task.cancel()
+        if self.bot is not None:
+            await self.bot.close()
+
+    def _snapshot_calls(self) -> Counter:
+        return Counter(self.stub.stats.calls)
+
+    async def _wait_for_roles(self, started: Dict[int, float], role_for_user: Dict[int, int], timeout: float) -> Dict[int, float]:
+        """Wait until the stub has seen each user's target role added, returning per-user latency"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        latencies: Dict[int, float] = {}
+        seen = 0
+        while len(latencies) < len(role_for_user) and loop.time() < deadline:
+            events = self.stub.stats.role_events
+            for event in events[seen:]:
+                if event.added and role_for_user.get(event.user_id) == event.role_id and event.user_id not in latencies:
+                    latencies[event.user_id] = event.at - started[event.user_id]
+            seen = len(events)
+            await asyncio.sleep(0.01)
+        return latencies
+
+    async def _settle(self, quiet: float, timeout: float) -> None:
+        """Wait until no REST calls have arrived for `quiet` seconds, so follow-up calls are counted"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        last_total = -1
+        while loop.time() < deadline:
+            total = sum(self.stub.stats.calls.values())
+            if total == last_total:
+                return
+            last_total = total
+            await asyncio.sleep(quiet)
+
+    async def city_storm(self, timeout: float) -> dict:
+        """Every user posts a city name in the city-selection channel at once"""
+        loop = asyncio.get_running_loop()
+        channel = self.guild.get_channel(self.channel_ids["city-selection"])
+        keywords = sorted(config.CITY_ROLES)
+        before = self._snapshot_calls()
+        started: Dict[int, float] = {}
+        role_for_user: Dict[int, int] = {}
+
+        wall_start = loop.time()
+        for user_id in self.user_ids:
+            keyword = random.choice(keywords)
+            role_for_user[user_id] = self.role_ids[config.CITY_ROLES[keyword]]
+            data = message_payload(self.stub.next_id(), channel.id, GUILD_ID, self.stub.users[user_id], keyword)
+            message = discord.Message(state=self.bot._connection, channel=channel, data=data)
+            started[user_id] = loop.time()
+            self.bot.dispatch("message", message)
+
+        latencies = await self._wait_for_roles(started, role_for_user, timeout)
+        wall = loop.time() - wall_start
+        await self._settle(quiet=1.0, timeout=timeout)
+        return self._report("city-pick storm", wall, latencies, before)
+
+    async def role_storm(self, timeout: float) -> dict:
+        """A moderator hands every user a leader role; the combo cog adds the matching combo role"""
+        loop = asyncio.get_running_loop()
+        locations = sorted(config.LOCATIONS)
+        leader_role = self.role_ids[sorted(config.LEADER_ROLES)[0]]
+        before = self._snapshot_calls()
+        started: Dict[int, float] = {}
+        role_for_user: Dict[int, int] = {}
+
+        wall_start = loop.time()
+        for index, user_id in enumerate(self.user_ids):
+            role_for_user[user_id] = self.role_ids[f"{locations[index % len(locations)]} Leader"]
+            started[user_id] = loop.time()
+            self.stub.apply_external_role_change(GUILD_ID, user_id, add={leader_role})
+
+        latencies = await self._wait_for_roles(started, role_for_user, timeout)
+        wall = loop.time() - wall_start
+        await self._settle(quiet=1.0, timeout=timeout)
+        return self._report("mass role change", wall, latencies, before)
+
+    def _report(self, name: str, wall: float, latencies: Dict[int, float], before: Counter) -> dict:
+        """Summarise a scenario run (delete_after cleanups that fire later are not counted)"""
+        calls = self._snapshot_calls() - before
+        values = list(latencies.values())
+        return {
+            "scenario": name,
+            "actions": self.user_count,
+            "completed": len(values),
+            "wall_s": wall,
+            "throughput": len(values) / wall if wall else 0.0,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": max(values, default=0.0) * 1000,
+            "calls": calls,
+            "calls_per_action": sum(calls.values()) / self.user_count,
+        }
+
+def print_report(report: dict, rate_limited: Counter) -> None:
+    """Print one scenario's numbers"""
+    print(f"\n== {report['scenario']} ==")
+    print(f"completed        {report['completed']}/{report['actions']} in {report['wall_s']:.2f}s")
+    print(f"throughput       {report['throughput']:.1f} role assignments/s")
+    print(f"latency p50/p95/p99/max  {report['p50_ms']:.0f} / {report['p95_ms']:.0f} / "
+          f"{report['p99_ms']:.0f} / {report['max_ms']:.0f} ms")
+    print(f"API calls/action {report['calls_per_action']:.2f}")
+    for route, count in sorted(report["calls"].items()):
+        print(f"  {route:<16} {count}")
+    if rate_limited:
+        print("429 responses so far: " + ", ".join(f"{route}={count}" for route, count in sorted(rate_limited.items())))
+
+async def run(args) -> None:
+    buckets = {} if args.no_ratelimits else None
+    global_limit = None if args.no_ratelimits else args.global_limit
+    stub = DiscordStub(latency=args.latency, jitter=args.jitter, event_latency=args.event_latency,
+                       buckets=buckets, global_limit=global_limit)
+    base_url = await stub.start()
+    discord.http.Route.BASE = base_url + API_PREFIX
+
+    test = LoadTest(stub, args.users)
+    try:
+        await test.setup()
+        if args.scenario in ("city-storm", "all"):
+            print_report(await test.city_storm(args.timeout), stub.stats.rate_limited)
+        if args.scenario in ("role-storm", "all"):
+            print_report(await test.role_storm(args.timeout), stub.stats.rate_limited)
+    finally:
+        await test.teardown()
+        await stub.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="synthetic users per scenario")
+    parser.add_argument("--scenario", choices=["city-storm", "role-storm", "all"], default="all")
+    parser.add_argument("--latency", type=float, default=0.05, help="REST latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random REST latency in seconds")
+    parser.add_argument("--event-latency", type=float, default=0.02, help="gateway event delay in seconds")
+    parser.add_argument("--global-limit", type=int, default=50, help="global requests per second")
+    parser.add_argument("--no-ratelimits", action="store_true", help="disable 429 buckets")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait per scenario")
+    args = parser.parse_args()
+
+    # bot.py configures INFO logging on import; keep the report readable
+    logging.getLogger().setLevel(logging.ERROR)
+    logging.getLogger("discord").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp:
+        from utils.guild_config import guild_config
+        guild_config.db_path = os.path.join(tmp, "guild_config.db")
+        from utils.role_snapshot import role_snapshot
+        role_snapshot.path = os.path.join(tmp, "role_snapshot.json.gz")
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
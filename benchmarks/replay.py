@@ -0,0 +1,489 @@
+"""
+Accelerated replay of captured gateway events
+Feeds a capture recorded with utils.event_capture through SGeBot.on_message and the cog
+listeners against in-process Discord objects, and reports throughput, handler latency and the
+decisions the bot made (which messages were flagged, limited, answered or given roles)
+
+Usage: python -m benchmarks.replay CAPTURE [--speed 1|10|max] [--max-gap S] [--api-latency S]
+                                           [--output FILE] [--compare FILE] [--baseline DIR]
+
+--baseline DIR replays the same capture against the code checked out in DIR first (for example
+a `git worktree` of the previous release) and diffs its decisions against this tree's.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import gzip
+import itertools
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import discord
+
+import config
+from benchmarks.discord_stub import member_payload, message_payload, user_payload
+from benchmarks.loadtest import percentile
+
+# Kept local (not imported from utils.event_capture) so --baseline works on checkouts that predate it
+MESSAGE_CREATE = "MESSAGE_CREATE"
+GUILD_MEMBER_UPDATE = "GUILD_MEMBER_UPDATE"
+SESSION_START = "SESSION_START"
+
+BOT_USER_ID = 1
+FIRST_MESSAGE_ID = 10 ** 15
+MENTION_PATTERN = re.compile(r"<[@#][!&]?\d+>")
+
+# Index of the capture event whose handlers are running, inherited by the tasks they create
+current_event: contextvars.ContextVar[int] = contextvars.ContextVar("current_event", default=-1)
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    """Read a capture, keeping session markers so idle gaps between sessions can be dropped"""
+    with gzip.open(path, "rt", encoding="utf-8") as capture_file:
+        return [json.loads(line) for line in capture_file if line.strip()]
+
+def schedule(events: List[Dict[str, Any]], speed: Optional[float], max_gap: float) -> List[Tuple[float, int, Dict[str, Any]]]:
+    """
+    Turn captured timestamps into replay offsets
+
+    Args:
+        events: Capture events in recorded order
+        speed: Replay speed multiplier, or None to replay as fast as possible
+        max_gap: Longest idle gap (capture seconds) kept between two events
+
+    Returns:
+        List[Tuple[float, int, Dict[str, Any]]]: (offset seconds, event index, event) per replayable event
+    """
+    timeline = []
+    offset = 0.0
+    previous = None
+    for event in events:
+        if event["type"] == SESSION_START:
+            previous = None
+            continue
+        if event["type"] == MESSAGE_CREATE and event.get("guild") is None:
+            continue  # direct messages are not replayed
+        if previous is not None and speed is not None:
+            offset += min(max(event["t"] - previous, 0.0), max_gap) / speed
+        previous = event["t"]
+        timeline.append((offset, len(timeline), event))
+    return timeline
+
+def summarize_send(payload: Dict[str, Any]) -> str:
+    """Short, ID-free form of a message the bot sent"""
+    content = payload.get("content") or ""
+    if not content and payload.get("embeds"):
+        content = "[embed] " + (payload["embeds"][0].get("title") or "")
+    return MENTION_PATTERN.sub("@", content).strip()[:48]
+
+def verdict(actions: List[str]) -> str:
+    """Collapse an event's actions into flagged / limited / acted / ignored"""
+    if any(action.startswith("send:🚫") for action in actions):
+        return "flagged"
+    if any(action.startswith("send:⏰") for action in actions):
+        return "limited"
+    return "acted" if actions else "ignored"
+
+class ReplayTransport:
+    """
+    Stands in for discord.py's HTTP client: answers the REST calls the bot makes and records
+    each one as a decision of the capture event that caused it
+    """
+
+    def __init__(self, world: "ReplayWorld", api_latency: float = 0.0):
+        self.world = world
+        self.api_latency = api_latency
+        self.decisions: Dict[int, List[str]] = defaultdict(list)
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(FIRST_MESSAGE_ID * 10)
+        self._patterns: Dict[str, re.Pattern] = {}
+
+    def _params(self, route: discord.http.Route) -> Dict[str, str]:
+        """Recover the path parameters discord.py formatted into the route URL"""
+        pattern = self._patterns.get(route.path)
+        if pattern is None:
+            pattern = self._patterns[route.path] = re.compile(
+                re.escape(route.path).replace(r"\{", "{").replace(r"\}", "}")
+                .replace("{", "(?P<").replace("}", ">[^/]+)") + "$"
+            )
+        match = pattern.search(route.url)
+        return match.groupdict() if match else {}
+
+    def _decide(self, action: str) -> None:
+        event = current_event.get()
+        if event >= 0:
+            self.decisions[event].append(action)
+
+    async def request(self, route: discord.http.Route, **kwargs: Any) -> Any:
+        key = f"{route.method} {route.path}"
+        self.calls[key] += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        params = self._params(route)
+        body = kwargs.get("json") or {}
+        if "form" in kwargs and not body:
+            for field in kwargs["form"] or []:
+                if field.get("name") == "payload_json":
+                    body = json.loads(field["value"])
+
+        if key == "GET /users/@me":
+            return user_payload(BOT_USER_ID, "SGeBot", bot=True)
+        if key == "GET /oauth2/applications/@me":
+            return {"id": str(BOT_USER_ID), "name": "SGeBot", "description": "", "icon": None,
+                    "bot_public": False, "bot_require_code_grant": False, "owner": user_payload(2, "owner"),
+                    "verify_key": "", "flags": 0}
+        if route.path == "/guilds/{guild_id}/members/{user_id}/roles/{role_id}":
+            sign = "+" if route.method == "PUT" else "-"
+            self._decide(f"role{sign}:{self.world.role_names.get(int(params['role_id']), params['role_id'])}")
+            return None
+        if key == "PATCH /guilds/{guild_id}/members/{user_id}":
+            if "roles" in body:
+                names = sorted(self.world.role_names.get(int(role_id), str(role_id)) for role_id in body["roles"])
+                self._decide("roles=" + ",".join(names))
+            user_id = int(params["user_id"])
+            return member_payload(user_payload(user_id, f"user{user_id}"), {int(role_id) for role_id in body.get("roles", [])})
+        if key == "POST /channels/{channel_id}/messages":
+            self._decide("send:" + summarize_send(body))
+            channel_id = int(params["channel_id"])
+            data = message_payload(next(self._message_ids), channel_id, self.world.guild_for_channel.get(channel_id),
+                                   user_payload(BOT_USER_ID, "SGeBot", bot=True), body.get("content") or "")
+            data["embeds"] = body.get("embeds") or []
+            return data
+        if key == "DELETE /channels/{channel_id}/messages/{message_id}":
+            # Only the triggering message counts; delete_after cleanups of the bot's own replies don't
+            if int(params["message_id"]) == FIRST_MESSAGE_ID + current_event.get():
+                self._decide("delete")
+            return None
+        if key == "POST /channels/{channel_id}/messages/bulk-delete":
+            self._decide(f"bulk_delete:{len(body.get('messages', []))}")
+            return None
+        if key == "PATCH /channels/{channel_id}":
+            channel = dict(self.world.channels[int(params["channel_id"])])
+            channel.update(body)
+            if "rate_limit_per_user" in body:
+                self._decide(f"slowmode:{body['rate_limit_per_user']}")
+            return channel
+
+        self.calls[f"unhandled {key}"] += 1
+        return None
+
+class ReplayWorld:
+    """Guilds, channels, roles and members reconstructed from the pseudonymous IDs in a capture"""
+
+    def __init__(self, events: List[Dict[str, Any]]):
+        self.role_ids: Dict[Tuple[int, str], int] = {}
+        self.role_names: Dict[int, str] = {}
+        self.channels: Dict[int, dict] = {}
+        self.guild_for_channel: Dict[int, int] = {}
+        self.guild_payloads: Dict[int, dict] = {}
+        self._ids = itertools.count(10 ** 16)
+        self._build(events)
+
+    def role_id(self, guild_id: int, name: str) -> int:
+        key = (guild_id, name)
+        if key not in self.role_ids:
+            self.role_ids[key] = next(self._ids)
+            self.role_names[self.role_ids[key]] = name
+        return self.role_ids[key]
+
+    def _build(self, events: List[Dict[str, Any]]) -> None:
+        config_roles = (
+            set(config.CITY_ROLES.values()) | config.COUNTRY_ROLES | config.LEADER_ROLES
+            | config.LOCATIONS | {f"{location} Leader" for location in config.LOCATIONS}
+        )
+        channels: Dict[int, Dict[int, dict]] = defaultdict(dict)
+        first_roles: Dict[int, Dict[int, List[str]]] = defaultdict(dict)
+
+        for event in events:
+            guild_id = event.get("guild")
+            if guild_id is None:
+                continue
+            if event["type"] == MESSAGE_CREATE:
+                if event["category"] is not None:
+                    channels[guild_id].setdefault(event["category"], {
+                        "id": str(event["category"]), "type": 4, "name": event["category_name"],
+                        "position": 0, "permission_overwrites": [],
+                    })
+                channels[guild_id].setdefault(event["channel"], {
+                    "id": str(event["channel"]), "type": 0, "name": event["channel_name"] or "channel",
+                    "position": len(channels[guild_id]), "permission_overwrites": [], "rate_limit_per_user": 0,
+                    "parent_id": str(event["category"]) if event["category"] is not None else None,
+                })
+                first_roles[guild_id].setdefault(event["author"], event["roles"])
+            elif event["type"] == GUILD_MEMBER_UPDATE:
+                first_roles[guild_id].setdefault(event["user"], event["before"])
+
+        for guild_id in set(channels) | set(first_roles):
+            guild_channels = channels[guild_id]
+            # The review channel city_pick posts to, if the capture never saw it
+            if not any(channel["name"] == config.UNRECOGNIZED_CITY_CHANNEL for channel in guild_channels.values()):
+                category_id, channel_id = next(self._ids), next(self._ids)
+                guild_channels[category_id] = {"id": str(category_id), "type": 4, "name": config.UNRECOGNIZED_CITY_CATEGORY,
+                                               "position": 0, "permission_overwrites": []}
+                guild_channels[channel_id] = {"id": str(channel_id), "type": 0, "name": config.UNRECOGNIZED_CITY_CHANNEL,
+                                              "position": len(guild_channels), "permission_overwrites": [],
+                                              "rate_limit_per_user": 0, "parent_id": str(category_id)}
+            for channel_id, channel in guild_channels.items():
+                channel["guild_id"] = str(guild_id)
+                self.channels[channel_id] = channel
+                self.guild_for_channel[channel_id] = guild_id
+
+            names = set(config_roles)
+            for roles in first_roles[guild_id].values():
+                names.update(roles)
+            for event in events:
+                if event.get("guild") == guild_id:
+                    names.update(event.get("roles", []) + event.get("after", []))
+            roles = [{"id": str(guild_id), "name": "@everyone", "permissions": "0", "position": 0,
+                      "color": 0, "hoist": False, "managed": False, "mentionable": False}]
+            for position, name in enumerate(sorted(names), start=1):
+                roles.append({"id": str(self.role_id(guild_id, name)), "name": name, "permissions": "0",
+                              "position": position, "color": 0, "hoist": False, "managed": False, "mentionable": False})
+
+            members = [member_payload(user_payload(user_id, f"user{user_id}"),
+                                      {self.role_id(guild_id, name) for name in role_names})
+                       for user_id, role_names in first_roles[guild_id].items()]
+            members.append(member_payload(user_payload(BOT_USER_ID, "SGeBot", bot=True), set()))
+
+            self.guild_payloads[guild_id] = {
+                "id": str(guild_id), "name": f"Replay {guild_id}", "owner_id": "2", "roles": roles,
+                "channels": list(guild_channels.values()), "members": members, "member_count": len(members),
+                "features": [], "emojis": [], "stickers": [], "icon": None, "splash": None,
+                "discovery_splash": None, "banner": None, "verification_level": 0,
+                "default_message_notifications": 0, "explicit_content_filter": 0, "mfa_level": 0,
+                "premium_tier": 0, "afk_timeout": 300, "system_channel_flags": 0,
+            }
+
+    def member_data(self, guild_id: int, user_id: int, role_names: List[str]) -> dict:
+        """Member payload with role names resolved to this world's role IDs"""
+        return member_payload(user_payload(user_id, f"user{user_id}"), {self.role_id(guild_id, name) for name in role_names})
+
+class Replay:
+    """Drives a capture through an SGeBot wired to a ReplayTransport"""
+
+    def __init__(self, events: List[Dict[str, Any]], api_latency: float = 0.0):
+        self.world = ReplayWorld(events)
+        self.transport = ReplayTransport(self.world, api_latency)
+        self.bot = None
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+
+    async def setup(self) -> None:
+        """Log a bot in through the transport and hand it the reconstructed guilds"""
+        from bot import SGeBot
+
+        self.bot = SGeBot()
+        self.bot.http.request = self.transport.request
+        await self.bot.login("replay-token")
+
+        # Keep decisions deterministic: no load shedding driven by this machine's loop lag
+        try:
+            from utils.load_monitor import load_monitor
+            load_monitor.stop()
+        except ImportError:
+            pass
+
+        state = self.bot._connection
+        for data in self.world.guild_payloads.values():
+            state._add_guild(discord.Guild(data=data, state=state))
+        try:
+            from utils.event_router import channel_router
+            channel_router.rebuild(self.bot.guilds)
+        except ImportError:
+            pass
+
+    async def teardown(self) -> None:
+        """Cancel leftover delete_after tasks and close the bot"""
+        current = asyncio.current_task()
+        for task in asyncio.all_tasks():
+            if task is not current and not task.done():
+                task.cancel()
+        if self.bot is not None:
+            await self.bot.close()
+
+    def _handlers(self, event_name: str) -> list:
+        handlers = list(self.bot.extra_events.get(f"on_{event_name}", []))
+        own = getattr(type(self.bot), f"on_{event_name}", None)
+        if own is not None:
+            handlers.insert(0, getattr(self.bot, f"on_{event_name}"))
+        return handlers
+
+    def _message(self, index: int, event: Dict[str, Any]) -> discord.Message:
+        guild = self.bot.get_guild(event["guild"])
+        channel = guild.get_channel(event["channel"])
+        member = self.world.member_data(event["guild"], event["author"], event["roles"])
+        data = message_payload(FIRST_MESSAGE_ID + index, event["channel"], event["guild"], member.pop("user"), event["content"])
+        data["member"] = member
+        return discord.Message(state=self.bot._connection, channel=channel, data=data)
+
+    async def _run_event(self, index: int, event: Dict[str, Any], scheduled: float) -> None:
+        """Run every handler for one event and record its latency from the scheduled time"""
+        current_event.set(index)
+        loop = asyncio.get_running_loop()
+        if event["type"] == MESSAGE_CREATE:
+            message = self._message(index, event)
+            calls = [handler(message) for handler in self._handlers("message")]
+        else:
+            member = self.bot.get_guild(event["guild"]).get_member(event["user"])
+            before = discord.Member._copy(member)
+            member._update(self.world.member_data(event["guild"], event["user"], event["after"]))
+            calls = [handler(before, member) for handler in self._handlers("member_update")]
+
+        for result in await asyncio.gather(*calls, return_exceptions=True):
+            if isinstance(result, Exception):
+                self.errors[type(result).__name__] += 1
+        self.latencies.append(loop.time() - scheduled)
+
+    async def run(self, timeline: List[Tuple[float, int, Dict[str, Any]]], speed: Optional[float]) -> Dict[str, Any]:
+        """Replay a schedule and return the summary"""
+        loop = asyncio.get_running_loop()
+        tasks = []
+        start = loop.time()
+        for offset, index, event in timeline:
+            scheduled = start + offset
+            if speed is not None:
+                delay = scheduled - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                scheduled = loop.time()
+            tasks.append(asyncio.create_task(self._run_event(index, event, scheduled)))
+            if speed is None:
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        wall = loop.time() - start
+
+        kinds = Counter(event["type"] for _, _, event in timeline)
+        return {
+            "events": len(timeline),
+            "messages": kinds[MESSAGE_CREATE],
+            "member_updates": kinds[GUILD_MEMBER_UPDATE],
+            "wall_s": wall,
+            "throughput": len(timeline) / wall if wall else 0.0,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p95_ms": percentile(self.latencies, 95) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+            "max_ms": max(self.latencies, default=0.0) * 1000,
+            "handler_errors": dict(self.errors),
+            "api_calls": dict(self.transport.calls),
+        }
+
+def print_summary(summary: Dict[str, Any], decisions: Dict[str, List[str]]) -> None:
+    print(f"\n== replay at {summary['speed']} ==")
+    print(f"events           {summary['events']} ({summary['messages']} messages, "
+          f"{summary['member_updates']} member updates) in {summary['wall_s']:.2f}s")
+    print(f"throughput       {summary['throughput']:.0f} events/s")
+    print(f"latency p50/p95/p99/max  {summary['p50_ms']:.2f} / {summary['p95_ms']:.2f} / "
+          f"{summary['p99_ms']:.2f} / {summary['max_ms']:.2f} ms")
+    verdicts = Counter(verdict(actions) for actions in decisions.values())
+    verdicts["ignored"] += summary["events"] - len(decisions)
+    print("decisions        " + ", ".join(f"{name}={count}" for name, count in sorted(verdicts.items())))
+    if summary["handler_errors"]:
+        print("handler errors   " + ", ".join(f"{name}={count}" for name, count in sorted(summary["handler_errors"].items())))
+    unhandled = {key: count for key, count in summary["api_calls"].items() if key.startswith("unhandled")}
+    if unhandled:
+        print("unhandled calls  " + ", ".join(f"{key[10:]}={count}" for key, count in sorted(unhandled.items())))
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], events: List[Dict[str, Any]], examples: int = 10) -> None:
+    """Print how the candidate's decisions differ from the baseline's, event by event"""
+    if baseline["summary"]["speed"] != candidate["summary"]["speed"]:
+        print("\nwarning: runs used different speeds; time-based limits will differ between them")
+    timeline = {str(index): event for _, index, event in schedule(events, None, 0.0)}
+    old, new = baseline["decisions"], candidate["decisions"]
+    transitions: Counter = Counter()
+    changed = []
+    for index in sorted(set(old) | set(new), key=int):
+        before, after = old.get(index, []), new.get(index, [])
+        if before != after:
+            transitions[(verdict(before), verdict(after))] += 1
+            changed.append((index, before, after))
+
+    print(f"\n== decision diff: {len(changed)} of {candidate['summary']['events']} events changed ==")
+    for (before, after), count in transitions.most_common():
+        print(f"  {before:>8} -> {after:<8} {count}")
+    for index, before, after in changed[:examples]:
+        event = timeline.get(index, {})
+        what = (f"#{event.get('channel_name')} {event.get('content', '')[:40]!r}" if event.get("type") == MESSAGE_CREATE
+                else f"roles {event.get('before')} -> {event.get('after')}")
+        print(f"  event {index} ({what})\n    baseline:  {before}\n    candidate: {after}")
+
+async def replay(args, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    speed = None if args.speed == "max" else float(args.speed)
+    runner = Replay(events, api_latency=args.api_latency)
+    try:
+        await runner.setup()
+        summary = await runner.run(schedule(events, speed, args.max_gap), speed)
+    finally:
+        await runner.teardown()
+    summary["speed"] = "max" if speed is None else f"{speed:g}x"
+    decisions = {str(index): actions for index, actions in sorted(runner.transport.decisions.items())}
+    return {"capture": os.path.abspath(args.capture), "summary": summary, "decisions": decisions}
+
+def run_baseline(args, code_dir: str) -> Dict[str, Any]:
+    """Replay the capture in a subprocess that imports the bot from another checkout"""
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "baseline.json")
+        command = [sys.executable, "-m", "benchmarks.replay", os.path.abspath(args.capture), "--speed", args.speed,
+                   "--max-gap", str(args.max_gap), "--api-latency", str(args.api_latency), "--output", output, "--quiet"]
+        # benchmarks/ is a namespace package, so this tree's replay module is found even if the baseline predates it
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join([os.path.abspath(code_dir), here])}
+        subprocess.run(command, cwd=code_dir, env=env, check=True)
+        with open(output, encoding="utf-8") as result_file:
+            return json.load(result_file)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="capture file written by !capture / EVENT_CAPTURE")
+    parser.add_argument("--speed", default="max", help="replay speed: 1, 10, any multiplier, or max")
+    parser.add_argument("--max-gap", type=float, default=10.0, help="longest idle gap kept, in capture seconds")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated REST latency in seconds")
+    parser.add_argument("--output", help="write the summary and per-event decisions to this JSON file")
+    parser.add_argument("--compare", help="diff decisions against a previous --output file")
+    parser.add_argument("--baseline", metavar="DIR", help="replay against the code in DIR first and diff against it")
+    parser.add_argument("--quiet", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # bot.py configures INFO logging on import; keep the report readable
+    logging.getLogger().setLevel(logging.ERROR)
+    logging.getLogger("discord").setLevel(logging.ERROR)
+
+    events = load_capture(args.capture)
+    baseline = None
+    if args.baseline:
+        baseline = run_baseline(args, args.baseline)
+        if not args.quiet:
+            print_summary(baseline["summary"], baseline["decisions"])
+    elif args.compare:
+        with open(args.compare, encoding="utf-8") as compare_file:
+            baseline = json.load(compare_file)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Never touch the real databases, snapshot or capture while replaying
+        config.EVENT_CAPTURE = {**getattr(config, "EVENT_CAPTURE", {}), "ENABLED": False}
+        config.ROLE_SNAPSHOT = {**getattr(config, "ROLE_SNAPSHOT", {}), "ENABLED": False}
+        config.LOG_FILE = os.path.join(tmp, "unrecognized_cities.txt")
+        try:
+            from utils.guild_config import guild_config
+            guild_config.db_path = os.path.join(tmp, "guild_config.db")
+        except ImportError:
+            pass
+        result = asyncio.run(replay(args, events))
+
+    if not args.quiet:
+        print_summary(result["summary"], result["decisions"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(result, output_file, ensure_ascii=False, indent=1)
+    if baseline is not None:
+        compare(baseline, result, events)
+
+if __name__ == "__main__":
+    main()
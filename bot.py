@@ -4,14 +4,23 @@ Handles bot initialization, cog loading, and core events
 """
 
 import sys
+import config
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import toml
+import time
 import asyncio
 
 # Import utilities
 from utils.logging_config import setup_logging, get_logger
 from utils.dos_protection import is_command_rate_limited, get_rate_limit_message, is_spam_detected, get_spam_message
+from utils.event_router import channel_router, SPAM_CHECK, COMMAND_LIMIT, COMMANDS, CITY_PICK
+from utils.raid_detection import raid_detector, CLEAN
+from utils.load_monitor import load_monitor
+from utils.role_snapshot import role_snapshot
+from utils.event_capture import event_recorder
+from utils.runtime_profile import runtime_profile
+from utils.content_analysis import content_analyzer
 
 # Setup logging
 setup_logging()
@@ -26,7 +35,15 @@ class SGeBot(commands.Bot):
         intents.members = True
         intents.guilds = True
         
-        super().__init__(command_prefix="!", intents=intents)
+        # With a role snapshot, guilds are chunked in the background after ready instead
+        super().__init__(
+            command_prefix="!",
+            intents=intents,
+            chunk_guilds_at_startup=not config.ROLE_SNAPSHOT["ENABLED"]
+        )
+        self.warmed_guilds = set()
+        # Strong references to fire-and-forget tasks; the event loop only keeps weak ones
+        self.background_tasks = set()
         
     async def setup_hook(self):
         """Setup hook called when the bot is starting up"""
@@ -38,6 +55,80 @@ class SGeBot(commands.Bot):
         await self.load_extension("cogs.admin")
         
         logger.info("All cogs loaded successfully")
+
+        self.expire_raid_modes.start()
+        load_monitor.start()
+        content_analyzer.start()
+
+        if config.ROLE_SNAPSHOT["ENABLED"]:
+            role_snapshot.load()
+            self.save_role_snapshot.start()
+
+        # Command names stay readable in captured content
+        event_recorder.add_vocabulary(self.all_commands)
+        if config.EVENT_CAPTURE["ENABLED"]:
+            event_recorder.start()
+        self.flush_event_capture.start()
+
+    async def close(self):
+        """Stop background monitors and persist the role snapshot and event capture before closing"""
+        load_monitor.stop()
+        content_analyzer.stop()
+        if config.ROLE_SNAPSHOT["ENABLED"]:
+            await role_snapshot.save()
+        await event_recorder.flush()
+        await super().close()
+
+    def spawn(self, coro, name):
+        """Run a coroutine in the background, keeping a reference and logging failures"""
+        task = asyncio.create_task(coro, name=name)
+        self.background_tasks.add(task)
+        task.add_done_callback(self._background_task_done)
+        return task
+
+    def _background_task_done(self, task):
+        """Drop a finished background task and log its exception, if any"""
+        self.background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background task '{task.get_name()}' failed: {task.exception()!r}")
+
+    @tasks.loop(seconds=config.EVENT_CAPTURE["FLUSH_INTERVAL"])
+    async def flush_event_capture(self):
+        """Write buffered captured events"""
+        await event_recorder.flush()
+
+    @tasks.loop(seconds=config.ROLE_SNAPSHOT["SAVE_INTERVAL"])
+    async def save_role_snapshot(self):
+        """Persist role snapshot changes"""
+        await role_snapshot.save()
+
+    async def warm_guild(self, guild):
+        """Reconcile from the role snapshot right away, then check it against live member data"""
+        combo_cog = self.get_cog("ComboRoles")
+        if combo_cog is not None:
+            await combo_cog.reconcile_from_snapshot(guild)
+
+        if not guild.chunked:
+            await guild.chunk()
+
+        changed = [member for member in guild.members if role_snapshot.verify(member) is not None]
+        live_ids = {member.id for member in guild.members}
+        for member_id in [member_id for member_id in role_snapshot.get_members(guild.id) if member_id not in live_ids]:
+            role_snapshot.remove_member(guild.id, member_id)
+
+        logger.info(f"Role snapshot verified for '{guild.name}': {len(changed)} member(s) changed while offline")
+        if combo_cog is not None and changed:
+            # verify() refreshed the snapshot with live roles, so diff against that
+            await combo_cog.reconcile_from_snapshot(guild, [member.id for member in changed])
+
+    @tasks.loop(seconds=30)
+    async def expire_raid_modes(self):
+        """Lift raid mode in guilds where the raid has died down"""
+        await raid_detector.expire_raid_modes(self.guilds)
+
+    @expire_raid_modes.before_loop
+    async def before_expire_raid_modes(self):
+        await self.wait_until_ready()
     
     async def on_ready(self):
         """Called when the bot is ready"""
@@ -46,22 +137,110 @@ class SGeBot(commands.Bot):
             logger.info(f"Bot is ready! Serving {len(self.guilds)} guild(s)")
         else:
             logger.error("Logged in, but bot.user is None")
+        channel_router.rebuild(self.guilds)
+
+        # on_ready fires again after reconnects; warm each guild once
+        if config.ROLE_SNAPSHOT["ENABLED"]:
+            for guild in self.guilds:
+                if guild.id not in self.warmed_guilds:
+                    self.warmed_guilds.add(guild.id)
+                    self.spawn(self.warm_guild(guild), f"warm guild {guild.id}")
+
+    async def on_guild_join(self, guild):
+        """Build channel routes for a newly joined guild"""
+        channel_router.build_guild(guild)
+
+    async def on_guild_remove(self, guild):
+        """Drop channel routes and snapshot data for a guild the bot left"""
+        channel_router.remove_guild(guild.id)
+        role_snapshot.remove_guild(guild.id)
+        self.warmed_guilds.discard(guild.id)
+
+    async def on_member_join(self, member):
+        """Add a new member to the role snapshot"""
+        if config.ROLE_SNAPSHOT["ENABLED"]:
+            role_snapshot.update_member(member)
+
+    async def on_raw_member_remove(self, payload):
+        """Drop a departed member from the role snapshot"""
+        if config.ROLE_SNAPSHOT["ENABLED"]:
+            role_snapshot.remove_member(payload.guild_id, payload.user.id)
+
+    async def on_member_update(self, before, after):
+        """Keep the role snapshot current and capture role changes"""
+        if before.roles != after.roles:
+            if config.ROLE_SNAPSHOT["ENABLED"]:
+                role_snapshot.update_member(after)
+            if event_recorder.enabled:
+                event_recorder.record_member_update(before, after)
+
+    async def on_guild_channel_create(self, channel):
+        """Route a newly created channel"""
+        channel_router.update_channel(channel)
+
+    async def on_guild_channel_update(self, before, after):
+        """Re-route a renamed or moved channel"""
+        channel_router.update_channel(after)
+
+    async def on_guild_channel_delete(self, channel):
+        """Drop the route for a deleted channel"""
+        channel_router.remove_channel(channel)
     
     async def on_message(self, message):
         """Handle incoming messages"""
         if message.author.bot:
             return
 
+        if event_recorder.enabled:
+            event_recorder.record_message(message)
+
+        # Route by channel; channels no subsystem cares about exit here
+        started = time.perf_counter()
+        subsystems = channel_router.route(message)
+        if not subsystems:
+            channel_router.record(subsystems, started)
+            return
+
+        guild_id = message.guild.id if message.guild else None
+
+        # Check the role snapshot the first time a member shows up this session
+        if (config.ROLE_SNAPSHOT["ENABLED"] and isinstance(message.author, discord.Member)
+                and role_snapshot.verify(message.author) is not None):
+            combo_cog = self.get_cog("ComboRoles")
+            if combo_cog is not None:
+                self.spawn(combo_cog.reconcile_from_snapshot(message.guild, [message.author.id]),
+                           f"combo reconcile for {message.author.id}")
+
+        raid = CLEAN
+        content_spam = False
+        if SPAM_CHECK in subsystems:
+            # Long messages are analyzed off the event loop
+            analysis = await content_analyzer.analyze(message.content)
+            content_spam = analysis.flagged
+            if guild_id is not None:
+                raid = raid_detector.observe(guild_id, message.channel.id, message.author.id, message.content,
+                                             fingerprint=analysis.fingerprint, watch_rate=CITY_PICK not in subsystems)
+        spam = SPAM_CHECK in subsystems and (
+            raid.flagged or content_spam or is_spam_detected(message.author.id, message.content, guild_id)
+        )
+        limited = not spam and COMMAND_LIMIT in subsystems and is_command_rate_limited(message.author.id, guild_id)
+        channel_router.record(subsystems, started)
+
+        # Guild-wide raid detection
+        if raid.triggered:
+            await raid_detector.enter_raid_mode(message.guild, message.channel, raid.reason)
+
         # Spam detection
-        if is_spam_detected(message.author.id, message.content):
+        if spam:
             logger.warning(f"Spam detected from {message.author} (ID: {message.author.id}): '{message.content[:50]}...'")
-            try:
-                await message.channel.send(
-                    f"🚫 {message.author.mention} {get_spam_message()}",
-                    delete_after=10
-                )
-            except discord.Forbidden:
-                logger.warning("Cannot send spam detection message to channel.")
+            if load_monitor.allows_notices():
+                try:
+                    await message.channel.send(
+                        f"🚫 {message.author.mention} {get_spam_message()}",
+                        delete_after=10
+                    )
+                except discord.Forbidden:
+                    logger.warning("Cannot send spam detection message to channel.")
             try:
                 await message.delete()
             except discord.Forbidden:
@@ -69,15 +248,16 @@ class SGeBot(commands.Bot):
             return
 
         # DoS protection for message handling
-        if is_command_rate_limited(message.author.id):
+        if limited:
             logger.warning(f"Rate limited message from {message.author} (ID: {message.author.id})")
-            try:
-                await message.channel.send(
-                    f"⏰ {message.author.mention} {get_rate_limit_message('commands')}",
-                    delete_after=10
-                )
-            except discord.Forbidden:
-                logger.warning("Cannot send rate limit message to channel.")
+            if load_monitor.allows_notices():
+                try:
+                    await message.channel.send(
+                        f"⏰ {message.author.mention} {get_rate_limit_message('commands', guild_id)}",
+                        delete_after=10
+                    )
+                except discord.Forbidden:
+                    logger.warning("Cannot send rate limit message to channel.")
             try:
                 await message.delete()
             except discord.Forbidden:
@@ -85,7 +265,8 @@ class SGeBot(commands.Bot):
             return
 
         # Process commands (cogs will handle their own message events)
-        await self.process_commands(message)
+        if COMMANDS in subsystems:
+            await self.process_commands(message)
 
 def load_secrets():
     """Load bot secrets from TOML file"""
@@ -106,6 +287,9 @@ def main():
     
     # Load secrets
     secrets = load_secrets()
+
+    # Event loop and decoder backends must be chosen before the loop exists
+    runtime_profile.apply(runtime_profile.select(secrets))
     
     # Create and run bot
     bot = SGeBot()
@@ -1,8 +1,17 @@
 import discord
 import logging
 import config
+from typing import Optional
 from discord.ext import commands
 from utils.dos_protection import dos_protection
+from utils.guild_config import guild_config, SET_SETTINGS, SETTING_KEYS
+from utils.event_router import channel_router, SUBSYSTEMS
+from utils.raid_detection import raid_detector
+from utils.load_monitor import load_monitor
+from utils.role_snapshot import role_snapshot
+from utils.event_capture import event_recorder
+from utils.runtime_profile import runtime_profile
+from utils.content_analysis import content_analyzer
 
 logger = logging.getLogger(__name__)
 
@@ -76,8 +85,9 @@ class Admin(commands.Cog):
                 timestamp=discord.utils.utcnow()
             )
             
+            settings = guild_config.get(ctx.guild.id if ctx.guild else None).dos_protection
             config_text = ""
-            for key, value in config.DOS_PROTECTION.items():
+            for key, value in settings.items():
                 if isinstance(value, dict):
                     config_text += f"• **{key}**:\n"
                     for sub_key, sub_value in value.items():
@@ -97,6 +107,269 @@ class Admin(commands.Cog):
             logger.error(f"Error getting DoS config: {e}")
             await ctx.send("❌ Error retrieving DoS protection configuration.")
 
+    @commands.command(name="guildconfig")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def show_guild_config(self, ctx):
+        """Show this server's role configuration (Admin only)"""
+        try:
+            view = guild_config.get(ctx.guild.id)
+            overrides = guild_config.get_overrides(ctx.guild.id)
+
+            embed = discord.Embed(
+                title="🗺️ Server Configuration",
+                color=discord.Color.green(),
+                timestamp=discord.utils.utcnow()
+            )
+
+            city_text = "\n".join(f"• `{keyword}` → {role}" for keyword, role in sorted(view.city_roles.items()))
+            embed.add_field(name="City Roles", value=city_text or "None", inline=False)
+            embed.add_field(name="Country Roles", value=", ".join(sorted(view.country_roles)) or "None", inline=False)
+            embed.add_field(name="Leader Roles", value=", ".join(sorted(view.leader_roles)) or "None", inline=False)
+            embed.add_field(name="Locations", value=", ".join(sorted(view.locations)) or "None", inline=False)
+            embed.add_field(
+                name="Overridden Settings",
+                value=", ".join(sorted(overrides)) or "None (using defaults)",
+                inline=False
+            )
+
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            logger.error(f"Error getting guild config: {e}")
+            await ctx.send("❌ Error retrieving server configuration.")
+
+    @commands.command(name="setcity")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def set_city(self, ctx, keyword: str, *, role_name: str):
+        """Map a city keyword to a role for this server (Admin only)"""
+        try:
+            guild_config.set_city_role(ctx.guild.id, keyword, role_name)
+            await ctx.send(f"✅ `{keyword.lower()}` now assigns **{role_name}**.")
+        except Exception as e:
+            logger.error(f"Error setting city role: {e}")
+            await ctx.send("❌ Error updating city roles.")
+
+    @commands.command(name="removecity")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def remove_city(self, ctx, keyword: str):
+        """Remove a city keyword for this server (Admin only)"""
+        try:
+            if guild_config.remove_city_role(ctx.guild.id, keyword):
+                await ctx.send(f"✅ Removed city `{keyword.lower()}`.")
+            else:
+                await ctx.send(f"❌ City `{keyword.lower()}` is not configured.")
+        except Exception as e:
+            logger.error(f"Error removing city role: {e}")
+            await ctx.send("❌ Error updating city roles.")
+
+    @commands.command(name="configadd")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def config_add(self, ctx, setting: str, *, role_name: str):
+        """Add a role to country_roles, leader_roles or locations (Admin only)"""
+        if setting not in SET_SETTINGS:
+            await ctx.send(f"❌ Setting must be one of: {', '.join(sorted(SET_SETTINGS))}")
+            return
+        try:
+            guild_config.add_role_name(ctx.guild.id, setting, role_name)
+            await ctx.send(f"✅ Added **{role_name}** to `{setting}`.")
+        except Exception as e:
+            logger.error(f"Error adding to {setting}: {e}")
+            await ctx.send("❌ Error updating server configuration.")
+
+    @commands.command(name="configremove")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def config_remove(self, ctx, setting: str, *, role_name: str):
+        """Remove a role from country_roles, leader_roles or locations (Admin only)"""
+        if setting not in SET_SETTINGS:
+            await ctx.send(f"❌ Setting must be one of: {', '.join(sorted(SET_SETTINGS))}")
+            return
+        try:
+            if guild_config.remove_role_name(ctx.guild.id, setting, role_name):
+                await ctx.send(f"✅ Removed **{role_name}** from `{setting}`.")
+            else:
+                await ctx.send(f"❌ **{role_name}** is not in `{setting}`.")
+        except Exception as e:
+            logger.error(f"Error removing from {setting}: {e}")
+            await ctx.send("❌ Error updating server configuration.")
+
+    @commands.command(name="setdos")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def set_dos(self, ctx, setting: str, value: int):
+        """Override a DoS protection value for this server (Admin only)"""
+        setting = setting.upper()
+        try:
+            guild_config.set_dos_value(ctx.guild.id, setting, value)
+            await ctx.send(f"✅ `{setting}` set to {value} for this server.")
+        except KeyError:
+            await ctx.send(f"❌ Unknown DoS protection setting `{setting}`.")
+        except ValueError:
+            await ctx.send("❌ Value must be at least 1.")
+        except Exception as e:
+            logger.error(f"Error setting DoS value: {e}")
+            await ctx.send("❌ Error updating DoS protection configuration.")
+
+    @commands.command(name="configreset")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def config_reset(self, ctx, setting: Optional[str] = None):
+        """Reset one setting, or all settings, to the defaults (Admin only)"""
+        if setting is not None and setting not in SETTING_KEYS:
+            await ctx.send(f"❌ Setting must be one of: {', '.join(sorted(SETTING_KEYS))}")
+            return
+        try:
+            guild_config.reset(ctx.guild.id, setting)
+            await ctx.send(f"✅ Reset {f'`{setting}`' if setting else 'all settings'} to defaults.")
+        except Exception as e:
+            logger.error(f"Error resetting guild config: {e}")
+            await ctx.send("❌ Error resetting server configuration.")
+
+    @commands.command(name="route")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def set_route(self, ctx, channel: discord.abc.GuildChannel, *subsystems: str):
+        """Show or pin a channel's subsystems; "default" clears the pin, "none" ignores it (Admin only)"""
+        if not subsystems:
+            policy = channel_router.resolve_policy(channel)
+            await ctx.send(f"📬 {channel.mention} → {', '.join(sorted(policy)) or 'ignored'}")
+            return
+
+        if list(subsystems) == ["default"]:
+            pinned = None
+        elif list(subsystems) == ["none"]:
+            pinned = []
+        else:
+            unknown = set(subsystems) - SUBSYSTEMS
+            if unknown:
+                await ctx.send(f"❌ Unknown subsystems: {', '.join(sorted(unknown))}. Valid: {', '.join(sorted(SUBSYSTEMS))}")
+                return
+            pinned = list(subsystems)
+
+        try:
+            guild_config.set_channel_route(ctx.guild.id, channel.id, pinned)
+            channel_router.update_channel(channel)
+            policy = channel_router.resolve_policy(channel)
+            await ctx.send(f"✅ {channel.mention} → {', '.join(sorted(policy)) or 'ignored'}")
+        except Exception as e:
+            logger.error(f"Error setting channel route: {e}")
+            await ctx.send("❌ Error updating channel routing.")
+
+    @commands.command(name="routestats")
+    @commands.has_permissions(administrator=True)
+    async def route_stats(self, ctx):
+        """Show channel routing throughput statistics (Admin only)"""
+        try:
+            stats = channel_router.get_stats()
+
+            embed = discord.Embed(
+                title="📬 Channel Routing Statistics",
+                color=discord.Color.blue(),
+                timestamp=discord.utils.utcnow()
+            )
+
+            stats_text = ""
+            for key, value in stats.items():
+                if isinstance(value, float):
+                    stats_text += f"• **{key}**: {value:.1f}\n"
+                else:
+                    stats_text += f"• **{key}**: {value}\n"
+
+            embed.add_field(name="Routing", value=stats_text, inline=False)
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            logger.error(f"Error getting routing stats: {e}")
+            await ctx.send("❌ Error retrieving routing statistics.")
+
+    @commands.command(name="raidstats")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def raid_stats(self, ctx):
+        """Show raid detection status and the most repeated messages (Admin only)"""
+        try:
+            stats = raid_detector.get_raid_stats(ctx.guild.id)
+            top = raid_detector.get_top_fingerprints(ctx.guild.id)
+
+            embed = discord.Embed(
+                title="🚨 Raid Detection",
+                color=discord.Color.red() if stats["raid_mode"] else discord.Color.blue(),
+                timestamp=discord.utils.utcnow()
+            )
+
+            if stats["raid_mode"]:
+                status_text = f"🔴 **Raid mode ON** ({stats['raid_remaining_s']}s left)\n"
+                status_text += f"• **Reason**: {stats['raid_reason']}\n"
+                status_text += f"• **Slowed Channels**: {stats['slowed_channels']}"
+            else:
+                status_text = "🟢 Normal"
+            embed.add_field(name="Status", value=status_text, inline=False)
+
+            top_text = ""
+            for hitter in top:
+                sample = discord.utils.escape_markdown(hitter.sample[:40])
+                top_text += f"• `{sample}` — {hitter.authors:.0f} accounts, {hitter.messages:.0f} msgs\n"
+            embed.add_field(name="Top Fingerprints", value=top_text or "None", inline=False)
+
+            embed.add_field(
+                name="Detector",
+                value=f"• **Raids Triggered**: {stats['raids_triggered']}\n"
+                      f"• **Sketch Memory**: {stats['sketch_bytes'] // 1024} KiB",
+                inline=False
+            )
+
+            await ctx.send(embed=embed)
+
+        except Exception as e:
+            logger.error(f"Error getting raid stats: {e}")
+            await ctx.send("❌ Error retrieving raid detection statistics.")
+
+    @commands.command(name="raidmode")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def raid_mode(self, ctx, mode: str):
+        """Turn raid mode on (slowmode this channel) or off (Admin only)"""
+        try:
+            if mode.lower() == "on":
+                await raid_detector.enter_raid_mode(ctx.guild, ctx.channel, f"enabled by {ctx.author}")
+                await ctx.send("🔴 Raid mode enabled.")
+            elif mode.lower() == "off":
+                await raid_detector.exit_raid_mode(ctx.guild)
+                await ctx.send("🟢 Raid mode disabled.")
+            else:
+                await ctx.send("❌ Usage: `!raidmode on` or `!raidmode off`")
+        except Exception as e:
+            logger.error(f"Error changing raid mode: {e}")
+            await ctx.send("❌ Error changing raid mode.")
+
+    @commands.command(name="capture")
+    @commands.has_permissions(administrator=True)
+    async def capture(self, ctx, mode: Optional[str] = None):
+        """Show or toggle anonymized gateway event capture for replay benchmarks (Admin only)"""
+        try:
+            if mode is not None and mode.lower() == "on":
+                event_recorder.start()
+            elif mode is not None and mode.lower() == "off":
+                event_recorder.stop()
+                await event_recorder.flush()
+            elif mode is not None:
+                await ctx.send("❌ Usage: `!capture [on|off]`")
+                return
+
+            stats = event_recorder.get_stats()
+            state = "🔴 Recording" if stats["enabled"] else "⚪ Not recording"
+            await ctx.send(
+                f"{state} to `{stats['path']}`\n"
+                f"Events recorded: {stats['recorded']} (written: {stats['written']}, buffered: {stats['buffered']})"
+            )
+        except Exception as e:
+            logger.error(f"Error changing event capture: {e}")
+            await ctx.send("❌ Error changing event capture.")
+
     @commands.command(name="ping")
     async def ping(self, ctx):
         """Check bot latency"""
@@ -145,6 +418,66 @@ class Admin(commands.Cog):
                 value=cog_status,
                 inline=False
             )
+
+            # Load level
+            load_stats = load_monitor.get_stats()
+            load_text = f"• **Level**: {load_stats['level']}\n"
+            load_text += f"• **Loop Lag**: {load_stats['lag_ms']:.0f}ms\n"
+            load_text += f"• **Pending Tasks**: {load_stats['queue_depth']}\n"
+            combo_cog = self.bot.get_cog("ComboRoles")
+            if combo_cog is not None:
+                deferred = sum(len(member_ids) for member_ids in combo_cog.deferred.values())
+                load_text += f"• **Deferred Combo Updates**: {deferred}\n"
+            load_text += "• **Time in Level**: " + ", ".join(
+                f"{level} {seconds:.0f}s" for level, seconds in load_stats["time_in_level"].items()
+            )
+
+            embed.add_field(
+                name="Load",
+                value=load_text,
+                inline=False
+            )
+
+            # Content analysis
+            analysis_stats = content_analyzer.get_stats()
+            embed.add_field(
+                name="Content Analysis",
+                value=(
+                    f"• **Inline**: {analysis_stats['inline']}\n"
+                    f"• **Offloaded**: {analysis_stats['offloaded']} ({analysis_stats['executor']} pool, "
+                    f"{analysis_stats['avg_batch']:.1f} per batch, {analysis_stats['queued']} queued)\n"
+                    f"• **Timeouts / Overloaded**: {analysis_stats['timeouts']} / {analysis_stats['overloaded']}"
+                ),
+                inline=False
+            )
+
+            # Runtime backends
+            backends = runtime_profile.get_backends()
+            embed.add_field(
+                name="Runtime",
+                value=(
+                    f"• **Profile**: {backends['profile']}\n"
+                    f"• **Event Loop**: {backends['event_loop']}\n"
+                    f"• **JSON**: {backends['json']}\n"
+                    f"• **Gateway Compression**: {backends['gateway_compression']}"
+                ),
+                inline=False
+            )
+
+            # Role snapshot
+            if config.ROLE_SNAPSHOT["ENABLED"]:
+                snapshot_stats = role_snapshot.get_stats()
+                snapshot_text = f"• **Members**: {snapshot_stats['members']} in {snapshot_stats['guilds']} guild(s)\n"
+                snapshot_text += f"• **Distinct Role Sets**: {snapshot_stats['distinct_role_sets']}\n"
+                snapshot_text += f"• **Verified This Session**: {snapshot_stats['verified_members']}\n"
+                saved = snapshot_stats["saved_seconds_ago"]
+                snapshot_text += f"• **Last Saved**: {f'{saved}s ago' if saved >= 0 else 'never'}"
+
+                embed.add_field(
+                    name="Role Snapshot",
+                    value=snapshot_text,
+                    inline=False
+                )
             
             await ctx.send(embed=embed)
             
@@ -1,10 +1,14 @@
 import discord
+import asyncio
 import datetime
 import logging
 import config
 from typing import Optional
 from discord.ext import commands
 from utils.dos_protection import is_city_selection_rate_limited, get_rate_limit_message
+from utils.guild_config import get_guild_config
+from utils.event_router import channel_router, CITY_PICK
+from utils.load_monitor import load_monitor
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +21,11 @@ class CityPick(commands.Cog):
     async def assign_city_role(self, member: discord.Member, guild: discord.Guild, role_name: str) -> str:
         """Assign a city role to a member"""
         # Rate limiting check
-        if is_city_selection_rate_limited(member.id):
-            return get_rate_limit_message("city_selection")
+        if is_city_selection_rate_limited(member.id, guild.id):
+            return get_rate_limit_message("city_selection", guild.id)
         
         # Remove any existing city role
-        city_role_names = set(config.CITY_ROLES.values())
+        city_role_names = get_guild_config(guild.id).city_role_names
         roles_to_remove = [role for role in member.roles if role.name in city_role_names]
         removed = False
         if roles_to_remove:
@@ -43,19 +47,32 @@ class CityPick(commands.Cog):
         else:
             return f"❌ Role **{role_name}** not found."
 
+    def _write_log(self, line: str) -> None:
+        """Append a line to LOG_FILE (runs in a worker thread)"""
+        with open(config.LOG_FILE, "a", encoding="utf-8") as log_file:
+            log_file.write(line)
+
     async def log_unrecognized_city(self, member: discord.Member, city_text: str) -> None:
         """Log unrecognized city submissions"""
+        guild = member.guild if hasattr(member, 'guild') else None
+        if guild is None:
+            logger.warning("Cannot find guild for member when logging unrecognized city.")
+            return
+
         # Rate limiting for logging to prevent spam
-        if is_city_selection_rate_limited(member.id):
+        if is_city_selection_rate_limited(member.id, guild.id):
             logger.warning(f"Rate limited logging attempt from {member} for city: {city_text}")
             return
             
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry = f"[{timestamp}] {member} (ID: {member.id}): {city_text}"
-        
-        guild = member.guild if hasattr(member, 'guild') else None
-        if guild is None:
-            logger.warning("Cannot find guild for member when logging unrecognized city.")
+
+        # Under heavy load, keep the submission in the log file instead of posting it
+        if not load_monitor.allows_review_posts():
+            try:
+                await asyncio.to_thread(self._write_log, f"[{guild.name}] {log_entry}\n")
+            except OSError as e:
+                logger.warning(f"Cannot write unrecognized city to '{config.LOG_FILE}': {e}")
             return
 
         channel = discord.utils.get(
@@ -78,19 +95,22 @@ class CityPick(commands.Cog):
         if message.author.bot:
             return
 
-        # Only handle messages in city-selection channels
-        if "city-selection" not in message.channel.name:
+        # Only handle messages in channels routed to city selection
+        if CITY_PICK not in channel_router.route(message):
             return
 
+        guild_id = message.guild.id if message.guild else None
+
         # Rate limiting check
-        if is_city_selection_rate_limited(message.author.id):
-            try:
-                await message.channel.send(
-                    f"⏰ {message.author.mention} {get_rate_limit_message('city_selection')}",
-                    delete_after=10
-                )
-            except discord.Forbidden:
-                logger.warning("Cannot send rate limit message to channel.")
+        if is_city_selection_rate_limited(message.author.id, guild_id):
+            if load_monitor.allows_notices():
+                try:
+                    await message.channel.send(
+                        f"⏰ {message.author.mention} {get_rate_limit_message('city_selection', guild_id)}",
+                        delete_after=10
+                    )
+                except discord.Forbidden:
+                    logger.warning("Cannot send rate limit message to channel.")
             try:
                 await message.delete()
             except discord.Forbidden:
@@ -106,8 +126,9 @@ class CityPick(commands.Cog):
             logger.warning("Message author is not a Member or guild is None.")
             return
 
-        if content in config.CITY_ROLES:
-            result_msg = await self.assign_city_role(member, guild, config.CITY_ROLES[content])
+        city_roles = get_guild_config(guild.id).city_roles
+        if content in city_roles:
+            result_msg = await self.assign_city_role(member, guild, city_roles[content])
         elif content == "other":
             result_msg = (
                 f"{member.mention} 📌 If your city isn't listed, please type:\n"
@@ -122,9 +143,10 @@ class CityPick(commands.Cog):
                 "Our team will review it soon. If you have questions, please contact a moderator."
             )
         else:
+            examples = ", ".join(f"`{city}`" for city in sorted(city_roles)[:3])
             result_msg = (
                 f"{member.mention} ❌ Sorry, I didn't recognize that city.\n"
-                "Please type the name of your city (e.g. `netanya`, `modiin`, `rehovot`),\n"
+                f"Please type the name of your city (e.g. {examples}),\n"
                 "or if your city isn't listed, type: `other your-city-name`."
             )
 
@@ -1,9 +1,12 @@
 import discord
+import asyncio
 import logging
-import config
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Set
 from discord.ext import commands
 from utils.dos_protection import is_combo_role_rate_limited
+from utils.guild_config import GuildConfigView, get_guild_config
+from utils.load_monitor import load_monitor
+from utils.role_snapshot import role_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -15,16 +18,19 @@ class ComboRoles(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        # Define combo role names
-        self.combo_role_names = [f"{loc} Leader" for loc in config.LOCATIONS]
+        # Members whose combo role update was deferred under load, by guild ID
+        self.deferred: Dict[int, Set[int]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        load_monitor.add_listener(self._on_load_change)
         # Set global reference
         global _combo_roles_cog
         _combo_roles_cog = self
 
-    def get_combo_role_name(self, user_roles: list[str]) -> Optional[str]:
+    def get_combo_role_name(self, user_roles: list[str], view: Optional[GuildConfigView] = None) -> Optional[str]:
         """Get the combo role name if user has both leader and location roles"""
-        leader = next((r for r in user_roles if r in config.LEADER_ROLES), None)
-        location = next((r for r in user_roles if r in config.LOCATIONS), None)
+        view = view or get_guild_config(None)
+        leader = next((r for r in user_roles if r in view.leader_roles), None)
+        location = next((r for r in user_roles if r in view.locations), None)
         if leader and location:
             return f"{location} Leader"
         return None
@@ -32,15 +38,16 @@ class ComboRoles(commands.Cog):
     async def update_combo_role(self, member: discord.Member) -> None:
         """Update combo role for a member based on their current roles"""
         # DoS protection for combo role updates
-        if is_combo_role_rate_limited(member.id):
+        guild = member.guild
+        if is_combo_role_rate_limited(member.id, guild.id):
             logger.warning(f"Rate limited combo role update for {member} (ID: {member.id})")
             return
             
         user_roles = [role.name for role in member.roles]
-        guild = member.guild
+        view = get_guild_config(guild.id)
 
         # Remove all existing combo roles
-        to_remove = [role for role in member.roles if role.name in self.combo_role_names]
+        to_remove = [role for role in member.roles if role.name in view.combo_role_names]
         if to_remove:
             try:
                 await member.remove_roles(*to_remove)
@@ -51,7 +58,7 @@ class ComboRoles(commands.Cog):
                 logger.warning(f"Error removing combo roles from {member.display_name}: {e}")
                 return
 
-        combo_role_name = self.get_combo_role_name(user_roles)
+        combo_role_name = self.get_combo_role_name(user_roles, view)
         if combo_role_name:
             combo_role = discord.utils.get(guild.roles, name=combo_role_name)
             if combo_role and combo_role not in member.roles:
@@ -63,29 +70,106 @@ class ComboRoles(commands.Cog):
                 except Exception as e:
                     logger.warning(f"Error adding combo role '{combo_role_name}' to {member.display_name}: {e}")
 
-    def is_only_combo_role_change(self, before_roles: List[discord.Role], after_roles: List[discord.Role]) -> bool:
+    async def reconcile_from_snapshot(self, guild: discord.Guild, member_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Fix combo roles for snapshot members without waiting for the guild to be chunked
+
+        Args:
+            guild: Guild whose roles are known (members may not be cached yet)
+            member_ids: Only reconcile these members (defaults to every snapshot member)
+
+        Returns:
+            int: Number of members whose combo roles were corrected
+        """
+        view = get_guild_config(guild.id)
+        role_names = {role.id: role.name for role in guild.roles}
+        combo_role_ids = {role.name: role.id for role in guild.roles if role.name in view.combo_role_names}
+        fixed = 0
+
+        members = role_snapshot.get_members(guild.id)
+        if member_ids is not None:
+            members = {member_id: members[member_id] for member_id in member_ids if member_id in members}
+        for member_id, role_ids in list(members.items()):
+            names = [role_names[role_id] for role_id in role_ids if role_id in role_names]
+            expected = self.get_combo_role_name(names, view)
+            current = {name for name in names if name in view.combo_role_names}
+            wanted = {expected} if expected in combo_role_ids else set()
+            if current == wanted:
+                continue
+
+            # The member may not be cached yet, so talk to the API by ID
+            new_role_ids = set(role_ids)
+            try:
+                for name in current - wanted:
+                    await self.bot.http.remove_role(guild.id, member_id, combo_role_ids[name], reason="Combo role reconciliation")
+                    new_role_ids.discard(combo_role_ids[name])
+                for name in wanted - current:
+                    await self.bot.http.add_role(guild.id, member_id, combo_role_ids[name], reason="Combo role reconciliation")
+                    new_role_ids.add(combo_role_ids[name])
+            except discord.HTTPException as e:
+                logger.warning(f"Cannot reconcile combo roles for member {member_id} in '{guild.name}': {e}")
+                continue
+            role_snapshot.set_roles(guild.id, member_id, new_role_ids)
+            fixed += 1
+
+        if fixed:
+            logger.info(f"Reconciled combo roles for {fixed} member(s) in '{guild.name}' from the role snapshot")
+        return fixed
+
+    def cog_unload(self):
+        """Stop listening for load changes when the cog is removed"""
+        load_monitor.remove_listener(self._on_load_change)
+
+    def _on_load_change(self, old_level, new_level) -> None:
+        """Catch up on deferred combo role updates once load drops"""
+        if self.deferred and not load_monitor.defers_combo_updates():
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self.flush_deferred())
+
+    async def flush_deferred(self) -> None:
+        """Run the combo role updates that were deferred under load"""
+        deferred, self.deferred = self.deferred, {}
+        total = sum(len(member_ids) for member_ids in deferred.values())
+        logger.info(f"Running {total} deferred combo role update(s)")
+        for guild_id, member_ids in deferred.items():
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue
+            while member_ids:
+                if load_monitor.defers_combo_updates():
+                    # Load went back up; keep the rest for the next recovery
+                    self.deferred.setdefault(guild_id, set()).update(member_ids)
+                    break
+                member = guild.get_member(member_ids.pop())
+                if member is not None:
+                    await self.update_combo_role(member)
+
+    def is_only_combo_role_change(self, before_roles: List[discord.Role], after_roles: List[discord.Role],
+                                  view: Optional[GuildConfigView] = None) -> bool:
         """Check if the only role change was a combo role"""
+        view = view or get_guild_config(None)
         before_names = set(role.name for role in before_roles)
         after_names = set(role.name for role in after_roles)
         changed = before_names.symmetric_difference(after_names)
-        return len(changed) > 0 and all(role in self.combo_role_names for role in changed)
+        return len(changed) > 0 and all(role in view.combo_role_names for role in changed)
 
     @commands.Cog.listener()
     async def on_member_update(self, before, after):
         """Handle member role updates"""
         if before.roles == after.roles:
             return
-        if self.is_only_combo_role_change(before.roles, after.roles):
+        view = get_guild_config(after.guild.id)
+        if self.is_only_combo_role_change(before.roles, after.roles, view):
             return
 
         # --- Remove city roles if a country role is added ---
-        city_role_names = set(config.CITY_ROLES.values())
+        city_role_names = view.city_role_names
         before_role_names = set(role.name for role in before.roles)
         after_role_names = set(role.name for role in after.roles)
         
         # Check if a country role was added
         added_roles = after_role_names - before_role_names
-        if any(role in config.COUNTRY_ROLES for role in added_roles):
+        if any(role in view.country_roles for role in added_roles):
             roles_to_remove = [role for role in after.roles if role.name in city_role_names]
             if roles_to_remove:
                 try:
@@ -94,6 +178,11 @@ class ComboRoles(commands.Cog):
                 except Exception as e:
                     logger.warning(f"Failed to remove city roles: {e}")
 
+        # Under heavy load, reconcile combo roles later
+        if load_monitor.defers_combo_updates():
+            self.deferred.setdefault(after.guild.id, set()).add(after.id)
+            return
+
         await self.update_combo_role(after)
 
 async def setup(bot):
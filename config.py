@@ -5,6 +5,9 @@ LOG_FILE = "unrecognized_cities.txt"
 UNRECOGNIZED_CITY_CHANNEL = "unrecognized-cities"
 UNRECOGNIZED_CITY_CATEGORY = "City selection"
 
+# Per-guild configuration database (overrides the defaults below per guild)
+GUILD_CONFIG_DB = "data/guild_config.db"
+
 # DoS Protection Configuration
 DOS_PROTECTION = {
     # City selection rate limiting
@@ -40,6 +43,93 @@ DOS_PROTECTION = {
     }
 }
 
+# Guild-wide raid detection (fixed-memory count-min sketches)
+RAID_DETECTION = {
+    "WINDOW": 60,  # seconds per sketch window
+    "SKETCH_WIDTH": 1024,  # counters per sketch row
+    "SKETCH_DEPTH": 4,  # sketch rows (hash functions)
+    "PAIR_FILTER_CAPACITY": 20000,  # distinct (account, message) pairs per Bloom filter before it rolls over
+    "PAIR_FILTER_ERROR_RATE": 0.001,  # chance a new pair is mistaken for a repeat
+    "TOP_FINGERPRINTS": 20,  # heavy hitters kept per guild
+    "MIN_FINGERPRINT_LENGTH": 8,  # ignore short chatter like "hi" or "gm"
+    "DISTINCT_AUTHORS_THRESHOLD": 15,  # same message from this many accounts per window
+    "CHANNEL_RATE_THRESHOLD": 300,  # messages per channel per window (not applied to city_pick channels)
+
+    # Raid mode
+    "RAID_MODE_DURATION": 600,  # seconds raid mode stays on after the last raid message
+    "RAID_SLOWMODE_SECONDS": 30,  # slowmode applied to raided channels
+    "RAID_LIMITS": {  # DOS_PROTECTION overrides while raid mode is on
+        "MAX_REPEATED_MESSAGES": 1,
+        "MAX_MESSAGES_PER_MINUTE": 4,
+        "MAX_COMMANDS_PER_WINDOW": 1,
+        "MAX_CITY_SELECTION_PER_WINDOW": 2,
+    },
+}
+
+# Content analysis (normalization, link and mention scoring) for spam and raid checks
+CONTENT_ANALYSIS = {
+    "FAST_PATH_CHARS": 300,  # messages up to this long are analyzed inline on the event loop
+    "EXECUTOR": "thread",  # "thread" or "process" pool for longer messages (see benchmarks/bench_content_analysis.py)
+    "WORKERS": 2,  # pool size
+    "BATCH_SIZE": 32,  # messages per pool task
+    "BATCH_DELAY": 0.005,  # seconds to wait for a batch to fill
+    "QUEUE_LIMIT": 2000,  # messages waiting for the pool before new ones get the failure policy
+    "TIMEOUT": 1.0,  # seconds to wait for a result
+    "FAILURE_POLICY": "open",  # on timeout/overload: "open" lets the message through, "closed" treats it as spam
+    "FINGERPRINT_CHARS": 200,  # normalized characters kept for raid fingerprints
+    "MAX_LINKS": 5,  # more links than this in one message is spam
+    "MAX_MENTIONS": 10,  # more user/role mentions than this in one message is spam
+}
+
+# Persisted member role snapshot for warm restarts
+ROLE_SNAPSHOT = {
+    "ENABLED": True,  # load at startup and chunk guilds in the background instead of blocking on it
+    "PATH": "data/role_snapshot.json.gz",
+    "SAVE_INTERVAL": 60,  # seconds between saves (only written when something changed)
+}
+
+# Gateway event capture for replay benchmarks (benchmarks/replay.py); anonymized, opt-in
+EVENT_CAPTURE = {
+    "ENABLED": False,  # record from startup (or toggle with !capture on|off)
+    "PATH": "data/captures/events.jsonl.gz",  # append-only; each flush adds a gzip member
+    "FLUSH_INTERVAL": 5,  # seconds between writes
+    "MAX_BUFFER": 1000,  # events buffered before an early write
+}
+
+# Runtime profile: "default", or "speed" for uvloop, a fast JSON backend and tuned zlib-stream
+# decoding where installed (pip install uvloop orjson). [runtime] profile in secrets.toml wins.
+RUNTIME = {
+    "PROFILE": "default",
+}
+
+# Event loop load monitor (levels: NORMAL, ELEVATED, HIGH, CRITICAL)
+LOAD_MONITOR = {
+    "SAMPLE_INTERVAL": 0.5,  # seconds between loop lag samples
+    "LAG_THRESHOLDS": [0.05, 0.25, 1.0],  # loop lag (s) that enters ELEVATED, HIGH, CRITICAL
+    "QUEUE_THRESHOLDS": [200, 1000, 5000],  # pending tasks that enter ELEVATED, HIGH, CRITICAL
+    "RECOVERY_SAMPLES": 10,  # consecutive calmer samples before dropping one level
+    "ADMISSION_FACTORS": [1.0, 1.0, 0.5, 0.25],  # MAX_* limit multiplier per level
+}
+
+# Channel event routing: which subsystems handle messages in each channel
+# Subsystems: "spam_check", "command_limit", "commands", "city_pick"
+CHANNEL_ROUTING = {
+    # Channels that don't match any rule below
+    "DEFAULT": ["spam_check", "command_limit", "commands"],
+    # Exact channel name -> subsystems
+    "CHANNEL_NAMES": {
+        "general": ["spam_check", "commands"],  # spam-check chat but don't command-limit it
+    },
+    # Channel name fragment -> subsystems (first match wins, after exact names)
+    "CHANNEL_NAME_RULES": {
+        "city-selection": ["spam_check", "command_limit", "commands", "city_pick"],
+    },
+    # Category name -> subsystems (used when no channel name rule matches)
+    "CATEGORY_RULES": {},
+    # Channel ID (as a string) -> subsystems, set per guild with !route
+    "CHANNEL_OVERRIDES": {},
+}
+
 COUNTRY_ROLES = {"Israel", "USA", "Canada", "Germany", "Other"}
 
 # City role logic
@@ -0,0 +1,204 @@
+"""
+Message content analysis
+Normalizes content and scores links and mentions for the spam and raid checks. Short messages
+are analyzed inline; longer ones are batched into a bounded worker pool so they never stall
+the event loop.
+"""
+
+import re
+import asyncio
+import logging
+import multiprocessing
+import concurrent.futures
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+import config
+from utils.raid_detection import normalize_message
+
+LINK_PATTERN = re.compile(r"https?://[^\s<>]+|discord(?:\.gg|(?:app)?\.com/invite)/\S+", re.IGNORECASE)
+USER_MENTION_PATTERN = re.compile(r"<@[!&]?\d+>")
+
+FAIL_OPEN = "open"
+FAIL_CLOSED = "closed"
+
+class ContentAnalysis(NamedTuple):
+    """Result of analyzing one message"""
+    fingerprint: str  # normalized content, truncated, for raid fingerprints
+    links: Tuple[str, ...]
+    mentions: int
+    flagged: bool  # spam by content alone
+    degraded: bool = False  # produced by the failure policy instead of real analysis
+
+def fingerprint_content(content: str, settings: Mapping[str, Any]) -> str:
+    """Raid fingerprint: normalizes only a bounded prefix, so it is cheap enough to run inline"""
+    limit = settings["FINGERPRINT_CHARS"]
+    return normalize_message(content[:limit * 2])[:limit]
+
+def analyze_content(content: str, settings: Mapping[str, Any]) -> ContentAnalysis:
+    """
+    Analyze one message. Pure function, safe to run in a worker process.
+
+    Args:
+        content: Raw message content
+        settings: CONTENT_ANALYSIS settings
+
+    Returns:
+        ContentAnalysis: Fingerprint, extracted links, mention count and spam flag
+    """
+    links = tuple(LINK_PATTERN.findall(content))
+    mentions = len(USER_MENTION_PATTERN.findall(content)) + content.count("@everyone") + content.count("@here")
+    fingerprint = fingerprint_content(content, settings)
+    flagged = len(links) > settings["MAX_LINKS"] or mentions > settings["MAX_MENTIONS"]
+    return ContentAnalysis(fingerprint, links, mentions, flagged)
+
+def analyze_batch(contents: List[str], settings: Mapping[str, Any]) -> List[ContentAnalysis]:
+    """Analyze a batch of messages in one worker call"""
+    return [analyze_content(content, settings) for content in contents]
+
+def _warm_up() -> None:
+    """No-op run once per worker at startup so the first real batch doesn't pay for process start"""
+
+class ContentAnalyzer:
+    """Async front end to content analysis with an inline fast path and a batching worker pool"""
+
+    def __init__(self, settings: Optional[Mapping[str, Any]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.settings = dict(settings if settings is not None else config.CONTENT_ANALYSIS)
+        self._executor: Optional[concurrent.futures.Executor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.stats = {"inline": 0, "offloaded": 0, "batches": 0, "timeouts": 0, "overloaded": 0, "errors": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._batcher is not None and not self._batcher.done()
+
+    def start(self) -> None:
+        """Start the worker pool and the batching task on the running event loop"""
+        if self.running:
+            return
+        workers = self.settings["WORKERS"]
+        if self.settings["EXECUTOR"] == "process":
+            # Never fork: the bot's loop and aiohttp's threads are already running by now
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            try:
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context(method)
+                )
+                for _ in range(workers):
+                    self._executor.submit(_warm_up)
+            except (OSError, NotImplementedError) as e:
+                self.logger.warning(f"Cannot start content analysis processes ({e}); using threads")
+                self._executor = None
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="content-analysis")
+        self._queue = asyncio.Queue(maxsize=self.settings["QUEUE_LIMIT"])
+        # Bound in-flight batches so a backlog waits here, not inside the pool
+        self._slots = asyncio.Semaphore(workers * 2)
+        self._batcher = asyncio.create_task(self._run_batches())
+
+    def stop(self) -> None:
+        """Stop batching, fail any waiting messages and shut the pool down"""
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                content, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_result(self._failure_result(content))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _failure_result(self, content: str) -> ContentAnalysis:
+        """
+        What a message gets when it can't be analyzed in time
+
+        The fingerprint is still computed inline so raid detection keeps working when the
+        pool is saturated.
+        """
+        closed = self.settings["FAILURE_POLICY"] == FAIL_CLOSED
+        return ContentAnalysis(fingerprint_content(content, self.settings), (), 0, closed, degraded=True)
+
+    async def analyze(self, content: str) -> ContentAnalysis:
+        """
+        Analyze a message without blocking the event loop
+
+        Args:
+            content: Raw message content
+
+        Returns:
+            ContentAnalysis: The analysis, or the failure policy's result (degraded=True) if the
+                             pool is overloaded or doesn't answer within TIMEOUT
+        """
+        if len(content) <= self.settings["FAST_PATH_CHARS"] or not self.running:
+            self.stats["inline"] += 1
+            return analyze_content(content, self.settings)
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((content, future))
+        except asyncio.QueueFull:
+            self.stats["overloaded"] += 1
+            return self._failure_result(content)
+
+        self.stats["offloaded"] += 1
+        try:
+            return await asyncio.wait_for(future, self.settings["TIMEOUT"])
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return self._failure_result(content)
+
+    async def _run_batches(self) -> None:
+        """Collect queued messages into batches and hand them to the pool"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.settings["BATCH_DELAY"]
+            while len(batch) < self.settings["BATCH_SIZE"]:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Messages whose caller already timed out are not worth sending
+            batch = [(content, future) for content, future in batch if not future.done()]
+            if not batch:
+                continue
+            await self._slots.acquire()
+            self.stats["batches"] += 1
+            work = loop.run_in_executor(self._executor, analyze_batch, [content for content, _ in batch], self.settings)
+            work.add_done_callback(lambda done, batch=batch: self._deliver(batch, done))
+
+    def _deliver(self, batch: List[Tuple[str, asyncio.Future]], done: asyncio.Future) -> None:
+        """Hand a finished batch's results to the waiting callers"""
+        self._slots.release()
+        if done.cancelled():
+            return
+        error = done.exception()
+        if error is not None:
+            self.stats["errors"] += 1
+            self.logger.error(f"Content analysis batch failed: {error}")
+            results = [self._failure_result(content) for content, _ in batch]
+        else:
+            results = done.result()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get analysis counters and the current backlog"""
+        stats = dict(self.stats)
+        stats["queued"] = self._queue.qsize() if self._queue is not None else 0
+        stats["executor"] = self.settings["EXECUTOR"] if self._executor is not None else "inline"
+        if isinstance(self._executor, concurrent.futures.ThreadPoolExecutor):
+            stats["executor"] = "thread"
+        stats["avg_batch"] = stats["offloaded"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+# Global instance
+content_analyzer = ContentAnalyzer()
@@ -5,8 +5,11 @@ Prevents various types of denial of service attacks
 
 import time
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 import config
+from utils.guild_config import get_guild_config
+from utils.raid_detection import raid_detector
+from utils.load_monitor import load_monitor
 
 # Global rate limit storage
 rate_limit_storage: Dict[str, Dict[int, List[float]]] = {}
@@ -14,26 +17,37 @@ rate_limit_storage: Dict[str, Dict[int, List[float]]] = {}
 # Spam detection storage
 spam_storage: Dict[int, List[Tuple[float, str]]] = {}
 
+# Rate limit type -> (window setting, max requests setting) in DOS_PROTECTION
+RATE_LIMIT_KEYS: Dict[str, Tuple[str, str]] = {
+    "city_selection": ("CITY_SELECTION_RATE_LIMIT_WINDOW", "MAX_CITY_SELECTION_PER_WINDOW"),
+    "commands": ("COMMAND_RATE_LIMIT_WINDOW", "MAX_COMMANDS_PER_WINDOW"),
+    "role_updates": ("ROLE_UPDATE_RATE_LIMIT_WINDOW", "MAX_ROLE_UPDATES_PER_WINDOW"),
+    "combo_role_updates": ("COMBO_ROLE_UPDATE_RATE_LIMIT_WINDOW", "MAX_COMBO_ROLE_UPDATES_PER_WINDOW"),
+}
+
 class DoSProtection:
     """Comprehensive DoS protection for Discord bot"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
     
-    def is_rate_limited(self, user_id: int, rate_limit_type: str) -> bool:
+    def is_rate_limited(self, user_id: int, rate_limit_type: str, settings: Optional[Mapping[str, Any]] = None) -> bool:
         """
         Check if user is rate limited for a specific action type
         
         Args:
             user_id: Discord user ID
             rate_limit_type: Type of rate limit (e.g., 'city_selection', 'commands', 'role_updates')
+            settings: DoS protection settings to apply (defaults to config.DOS_PROTECTION)
             
         Returns:
             bool: True if rate limited, False otherwise
         """
-        if rate_limit_type not in config.DOS_PROTECTION:
+        settings = settings if settings is not None else config.DOS_PROTECTION
+        if rate_limit_type not in RATE_LIMIT_KEYS:
             self.logger.warning(f"Unknown rate limit type: {rate_limit_type}")
             return False
+        window_key, max_key = RATE_LIMIT_KEYS[rate_limit_type]
             
         current_time = time.time()
         
@@ -45,8 +59,7 @@ class DoSProtection:
         
         # Clean old timestamps
         if user_id in user_data:
-            window_key = f"{rate_limit_type.upper()}_RATE_LIMIT_WINDOW"
-            window = config.DOS_PROTECTION.get(window_key, 60)
+            window = settings.get(window_key, 60)
             user_data[user_id] = [
                 ts for ts in user_data[user_id] 
                 if current_time - ts < window
@@ -55,8 +68,7 @@ class DoSProtection:
             user_data[user_id] = []
         
         # Check if user has exceeded limit
-        max_key = f"MAX_{rate_limit_type.upper()}_PER_WINDOW"
-        max_requests = config.DOS_PROTECTION.get(max_key, 5)
+        max_requests = settings.get(max_key, 5)
         
         if len(user_data[user_id]) >= max_requests:
             self.logger.warning(f"Rate limited {rate_limit_type} for user {user_id}")
@@ -66,36 +78,38 @@ class DoSProtection:
         user_data[user_id].append(current_time)
         return False
     
-    def is_spam_detected(self, user_id: int, message_content: str) -> bool:
+    def is_spam_detected(self, user_id: int, message_content: str, settings: Optional[Mapping[str, Any]] = None) -> bool:
         """
         Detect spam based on repeated similar messages
         
         Args:
             user_id: Discord user ID
             message_content: Content of the message
+            settings: DoS protection settings to apply (defaults to config.DOS_PROTECTION)
             
         Returns:
             bool: True if spam detected, False otherwise
         """
+        settings = settings if settings is not None else config.DOS_PROTECTION
         current_time = time.time()
         
         # Clean old messages
         if user_id in spam_storage:
             spam_storage[user_id] = [
                 (ts, content) for ts, content in spam_storage[user_id]
-                if current_time - ts < config.DOS_PROTECTION.get("SPAM_WINDOW", 60)
+                if current_time - ts < settings.get("SPAM_WINDOW", 60)
             ]
         else:
             spam_storage[user_id] = []
         
         # Check for repeated messages
         recent_messages = [content for _, content in spam_storage[user_id]]
-        if recent_messages.count(message_content) >= config.DOS_PROTECTION.get("MAX_REPEATED_MESSAGES", 3):
+        if recent_messages.count(message_content) >= settings.get("MAX_REPEATED_MESSAGES", 3):
             self.logger.warning(f"Spam detected for user {user_id}: repeated message '{message_content[:50]}...'")
             return True
         
         # Check for rapid message sending
-        max_messages = config.DOS_PROTECTION.get("MAX_MESSAGES_PER_MINUTE", 10)
+        max_messages = settings.get("MAX_MESSAGES_PER_MINUTE", 10)
         if len(spam_storage[user_id]) >= max_messages:
             self.logger.warning(f"Spam detected for user {user_id}: too many messages per minute")
             return True
@@ -104,13 +118,13 @@ class DoSProtection:
         spam_storage[user_id].append((current_time, message_content))
         return False
     
-    def get_rate_limit_message(self, rate_limit_type: str) -> str:
+    def get_rate_limit_message(self, rate_limit_type: str, settings: Optional[Mapping[str, Any]] = None) -> str:
         """Get user-friendly rate limit message"""
-        window_key = f"{rate_limit_type.upper()}_RATE_LIMIT_WINDOW"
-        max_key = f"MAX_{rate_limit_type.upper()}_PER_WINDOW"
+        settings = settings if settings is not None else config.DOS_PROTECTION
+        window_key, max_key = RATE_LIMIT_KEYS.get(rate_limit_type, ("", ""))
         
-        window = config.DOS_PROTECTION.get(window_key, 60)
-        max_requests = config.DOS_PROTECTION.get(max_key, 5)
+        window = settings.get(window_key, 60)
+        max_requests = settings.get(max_key, 5)
         
         return f"⏰ Please wait before making another request. Rate limit: {max_requests} requests per {window} seconds."
     
@@ -171,29 +185,34 @@ class DoSProtection:
 dos_protection = DoSProtection()
 
 # Convenience functions
-def is_city_selection_rate_limited(user_id: int) -> bool:
+def get_protection_settings(guild_id: Optional[int] = None) -> Mapping[str, Any]:
+    """Get a guild's DoS protection settings, tightened during raids and under heavy load"""
+    settings = raid_detector.apply_raid_limits(guild_id, get_guild_config(guild_id).dos_protection)
+    return load_monitor.apply_admission_limits(settings)
+
+def is_city_selection_rate_limited(user_id: int, guild_id: Optional[int] = None) -> bool:
     """Check if user is rate limited for city selection"""
-    return dos_protection.is_rate_limited(user_id, "city_selection")
+    return dos_protection.is_rate_limited(user_id, "city_selection", get_protection_settings(guild_id))
 
-def is_command_rate_limited(user_id: int) -> bool:
+def is_command_rate_limited(user_id: int, guild_id: Optional[int] = None) -> bool:
     """Check if user is rate limited for commands"""
-    return dos_protection.is_rate_limited(user_id, "commands")
+    return dos_protection.is_rate_limited(user_id, "commands", get_protection_settings(guild_id))
 
-def is_role_update_rate_limited(user_id: int) -> bool:
+def is_role_update_rate_limited(user_id: int, guild_id: Optional[int] = None) -> bool:
     """Check if user is rate limited for role updates"""
-    return dos_protection.is_rate_limited(user_id, "role_updates")
+    return dos_protection.is_rate_limited(user_id, "role_updates", get_protection_settings(guild_id))
 
-def is_combo_role_rate_limited(user_id: int) -> bool:
+def is_combo_role_rate_limited(user_id: int, guild_id: Optional[int] = None) -> bool:
     """Check if user is rate limited for combo role updates"""
-    return dos_protection.is_rate_limited(user_id, "combo_role_updates")
+    return dos_protection.is_rate_limited(user_id, "combo_role_updates", get_protection_settings(guild_id))
 
-def is_spam_detected(user_id: int, message_content: str) -> bool:
+def is_spam_detected(user_id: int, message_content: str, guild_id: Optional[int] = None) -> bool:
     """Check if message is spam"""
-    return dos_protection.is_spam_detected(user_id, message_content)
+    return dos_protection.is_spam_detected(user_id, message_content, get_protection_settings(guild_id))
 
-def get_rate_limit_message(rate_limit_type: str) -> str:
+def get_rate_limit_message(rate_limit_type: str, guild_id: Optional[int] = None) -> str:
     """Get rate limit message for specific type"""
-    return dos_protection.get_rate_limit_message(rate_limit_type)
+    return dos_protection.get_rate_limit_message(rate_limit_type, get_protection_settings(guild_id))
 
 def get_spam_message() -> str:
     """Get spam detection message"""
@@ -0,0 +1,220 @@
+"""
+Gateway event capture
+Opt-in recorder that appends anonymized MESSAGE_CREATE and GUILD_MEMBER_UPDATE events, with
+their timing, to a gzip file for replay with benchmarks.replay
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+import discord
+import config
+from utils.guild_config import get_guild_config
+
+MESSAGE_CREATE = "MESSAGE_CREATE"
+GUILD_MEMBER_UPDATE = "GUILD_MEMBER_UPDATE"
+SESSION_START = "SESSION_START"
+
+PSEUDO_ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+WORD_PATTERN = re.compile(r"\w+")
+# Mentions keep their shape with a pseudonymous ID; every other word is replaced
+TOKEN_PATTERN = re.compile(r"<(?P<mention_type>@[!&]?|#)(?P<mention_id>\d+)>|\w+")
+
+def read_capture(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read events from a capture file
+
+    Args:
+        path: Path to a gzip capture (every flush appends a gzip member; all are read)
+
+    Returns:
+        Iterator[Dict[str, Any]]: Events in the order they were recorded
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as capture_file:
+        for line in capture_file:
+            if line.strip():
+                yield json.loads(line)
+
+class EventRecorder:
+    """Buffers anonymized gateway events and appends them to a compressed capture file"""
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.settings = settings if settings is not None else config.EVENT_CAPTURE
+        self.enabled = False
+        self.path = self.settings["PATH"]
+        self.recorded = 0
+        self.written = 0
+        self._buffer: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Per-session key: pseudonyms are stable within a capture session and cannot be reversed
+        self._key = os.urandom(16)
+        self._ids: Dict[int, int] = {}
+        self._words: Dict[str, str] = {}
+        self._vocabulary: Set[str] = {"other"}
+
+    def start(self, path: Optional[str] = None) -> None:
+        """Start recording, beginning a new session in the capture file"""
+        if path is not None:
+            self.path = path
+        if self.enabled:
+            return
+        self._key = os.urandom(16)
+        self._ids.clear()
+        self._words.clear()
+        self.enabled = True
+        self._append({"type": SESSION_START, "t": time.time()})
+        self.logger.info(f"Recording gateway events to {self.path}")
+
+    def stop(self) -> None:
+        """Stop recording (call flush() to write what is still buffered)"""
+        if self.enabled:
+            self.enabled = False
+            self.logger.info(f"Stopped recording gateway events ({self.recorded} recorded)")
+
+    def add_vocabulary(self, words: Iterable[str]) -> None:
+        """Words kept verbatim in recorded content (command names, for example)"""
+        self._vocabulary.update(word.lower() for word in words)
+
+    # --- Anonymization ------------------------------------------------------
+
+    def _digest(self, value: str, size: int) -> bytes:
+        return hashlib.blake2b(value.encode(), key=self._key, digest_size=size).digest()
+
+    def pseudonym(self, snowflake: Optional[int]) -> Optional[int]:
+        """Stable anonymous stand-in for a Discord ID"""
+        if snowflake is None:
+            return None
+        pseudo = self._ids.get(snowflake)
+        if pseudo is None:
+            pseudo = self._ids[snowflake] = int.from_bytes(self._digest(str(snowflake), 6), "big") | 1 << 48
+        return pseudo
+
+    def _pseudo_word(self, word: str, keep: Set[str]) -> str:
+        """Replace a word with a same-length token, keeping its case pattern"""
+        lowered = word.lower()
+        if lowered in keep or lowered in self._vocabulary:
+            return word
+        token = self._words.get(lowered)
+        if token is None:
+            digest = self._digest(lowered, min(max(len(lowered), 1), 64))
+            token = "".join(PSEUDO_ALPHABET[byte % len(PSEUDO_ALPHABET)] for byte in digest)
+            token = (token * (len(lowered) // len(token) + 1))[:len(lowered)]
+            if len(self._words) > 100_000:
+                self._words.clear()
+            self._words[lowered] = token
+        if word.isupper():
+            return token.upper()
+        if word[:1].isupper():
+            return token.capitalize()
+        return token
+
+    def anonymize_content(self, content: str, guild_id: Optional[int]) -> str:
+        """
+        Anonymize message content word by word
+
+        Identical messages stay identical and case/whitespace variants stay variants, so spam
+        and raid detection see the same repetition patterns. Punctuation is kept, mentions
+        get pseudonymous IDs, and city keywords, "other" and command names are kept so city
+        picks and commands replay as they happened.
+
+        Args:
+            content: Raw message content
+            guild_id: Guild the message was sent in (for its city keywords)
+
+        Returns:
+            str: Anonymized content
+        """
+        keep = set()
+        if guild_id is not None:
+            for keyword in get_guild_config(guild_id).city_roles:
+                keep.update(WORD_PATTERN.findall(keyword.lower()))
+
+        def replace(match: "re.Match[str]") -> str:
+            if match.group("mention_id"):
+                return f"<{match.group('mention_type')}{self.pseudonym(int(match.group('mention_id')))}>"
+            return self._pseudo_word(match.group(0), keep)
+
+        return TOKEN_PATTERN.sub(replace, content)
+
+    # --- Recording ----------------------------------------------------------
+
+    def record_message(self, message: discord.Message) -> None:
+        """Record a MESSAGE_CREATE"""
+        channel = message.channel
+        # Threads replay as messages in their parent channel, which is how they are routed
+        if isinstance(channel, discord.Thread) and channel.parent is not None:
+            channel = channel.parent
+        category = getattr(channel, "category", None)
+        guild_id = message.guild.id if message.guild else None
+        author = message.author
+        self._append({
+            "type": MESSAGE_CREATE,
+            "t": time.time(),
+            "guild": self.pseudonym(guild_id),
+            "channel": self.pseudonym(channel.id),
+            "channel_name": getattr(channel, "name", None),
+            "category": self.pseudonym(category.id) if category else None,
+            "category_name": category.name if category else None,
+            "author": self.pseudonym(author.id),
+            "roles": [role.name for role in getattr(author, "roles", []) if not role.is_default()],
+            "content": self.anonymize_content(message.content, guild_id),
+        })
+
+    def record_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        """Record a GUILD_MEMBER_UPDATE that changed roles"""
+        self._append({
+            "type": GUILD_MEMBER_UPDATE,
+            "t": time.time(),
+            "guild": self.pseudonym(after.guild.id),
+            "user": self.pseudonym(after.id),
+            "before": [role.name for role in before.roles if not role.is_default()],
+            "after": [role.name for role in after.roles if not role.is_default()],
+        })
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        self._buffer.append(json.dumps(event, separators=(",", ":"), ensure_ascii=False))
+        self.recorded += 1
+        if len(self._buffer) >= self.settings["MAX_BUFFER"] and (self._flush_task is None or self._flush_task.done()):
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass
+
+    def _write(self, lines: List[str]) -> None:
+        """Append lines as a new gzip member"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(self.path, "at", encoding="utf-8") as capture_file:
+            capture_file.write("\n".join(lines) + "\n")
+
+    async def flush(self) -> None:
+        """Write buffered events off the event loop"""
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+            self.written += len(lines)
+        except OSError as e:
+            self.logger.error(f"Cannot write event capture {self.path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get recorder statistics"""
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "recorded": self.recorded,
+            "written": self.written,
+            "buffered": len(self._buffer),
+        }
+
+# Global instance
+event_recorder = EventRecorder()
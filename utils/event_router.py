@@ -0,0 +1,165 @@
+"""
+Channel event router
+Maps channel IDs to the subsystems that handle their messages, so irrelevant traffic exits in O(1)
+"""
+
+import time
+import logging
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+import discord
+from utils.guild_config import get_guild_config, guild_config
+
+# Subsystems a channel can route messages to
+SPAM_CHECK = "spam_check"
+COMMAND_LIMIT = "command_limit"
+COMMANDS = "commands"
+CITY_PICK = "city_pick"
+SUBSYSTEMS = frozenset({SPAM_CHECK, COMMAND_LIMIT, COMMANDS, CITY_PICK})
+
+# Policy for messages outside guilds (DMs): commands, still spam-checked and rate limited
+DIRECT_MESSAGE_POLICY: FrozenSet[str] = frozenset({SPAM_CHECK, COMMAND_LIMIT, COMMANDS})
+
+class ChannelRouter:
+    """Channel-ID dispatch table built on ready and kept current from channel events"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._routes: Dict[int, FrozenSet[str]] = {}
+        self._guild_channels: Dict[int, Set[int]] = {}
+        self.routed: Counter = Counter()
+        self.ignored = 0
+        self.ignored_time = 0.0
+        self.routed_messages = 0
+        self.routed_time = 0.0
+        guild_config.add_listener(self._on_config_change)
+
+    def resolve_policy(self, channel) -> FrozenSet[str]:
+        """
+        Work out which subsystems handle messages in a channel
+
+        Args:
+            channel: Guild channel (text, voice or forum)
+
+        Returns:
+            FrozenSet[str]: Subsystem names for the channel
+        """
+        routing = get_guild_config(channel.guild.id).channel_routing
+
+        pinned = routing["CHANNEL_OVERRIDES"].get(channel.id)
+        if pinned is not None:
+            return pinned
+
+        name = channel.name
+        exact = routing["CHANNEL_NAMES"].get(name)
+        if exact is not None:
+            return exact
+        for fragment, subsystems in routing["CHANNEL_NAME_RULES"].items():
+            if fragment in name:
+                return subsystems
+
+        category = getattr(channel, "category", None)
+        if category is not None and category.name in routing["CATEGORY_RULES"]:
+            return routing["CATEGORY_RULES"][category.name]
+
+        return routing["DEFAULT"]
+
+    def update_channel(self, channel) -> None:
+        """Add or refresh the route for a single channel"""
+        if isinstance(channel, discord.CategoryChannel):
+            # Category renames change the policy of every child channel
+            for child in channel.channels:
+                self.update_channel(child)
+            return
+        self._routes[channel.id] = self.resolve_policy(channel)
+        self._guild_channels.setdefault(channel.guild.id, set()).add(channel.id)
+
+    def remove_channel(self, channel) -> None:
+        """Drop the route for a deleted channel"""
+        self._routes.pop(channel.id, None)
+        self._guild_channels.get(channel.guild.id, set()).discard(channel.id)
+
+    def build_guild(self, guild: discord.Guild) -> None:
+        """Build routes for every channel in a guild"""
+        self.remove_guild(guild.id)
+        for channel in guild.channels:
+            if not isinstance(channel, discord.CategoryChannel):
+                self.update_channel(channel)
+
+    def remove_guild(self, guild_id: int) -> None:
+        """Drop all routes for a guild"""
+        for channel_id in self._guild_channels.pop(guild_id, set()):
+            self._routes.pop(channel_id, None)
+
+    def rebuild(self, guilds: Iterable[discord.Guild]) -> None:
+        """Rebuild the whole dispatch table"""
+        self._routes.clear()
+        self._guild_channels.clear()
+        for guild in guilds:
+            self.build_guild(guild)
+        self.logger.info(f"Built channel routes for {len(self._routes)} channels")
+
+    def _on_config_change(self, guild_id: Optional[int]) -> None:
+        """Forget cached routes when a guild's routing config changes; they are rebuilt lazily"""
+        if guild_id is None:
+            self._routes.clear()
+            self._guild_channels.clear()
+        else:
+            self.remove_guild(guild_id)
+
+    def route(self, message: discord.Message) -> FrozenSet[str]:
+        """
+        Get the subsystems that should handle a message
+
+        Args:
+            message: Incoming Discord message
+
+        Returns:
+            FrozenSet[str]: Subsystem names (empty if the message should be ignored)
+        """
+        channel = message.channel
+        policy = self._routes.get(channel.id)
+        if policy is not None:
+            return policy
+
+        if message.guild is None:
+            return DIRECT_MESSAGE_POLICY
+
+        # Threads follow their parent channel's policy
+        parent = getattr(channel, "parent", None)
+        if parent is not None:
+            policy = self._routes.get(parent.id)
+            if policy is None:
+                self.update_channel(parent)
+                policy = self._routes[parent.id]
+            self._routes[channel.id] = policy
+            self._guild_channels.setdefault(message.guild.id, set()).add(channel.id)
+            return policy
+
+        self.update_channel(channel)
+        return self._routes[channel.id]
+
+    def record(self, subsystems: FrozenSet[str], started: float) -> None:
+        """Record throughput numbers for a message that finished routing"""
+        elapsed = time.perf_counter() - started
+        if subsystems:
+            self.routed_messages += 1
+            self.routed_time += elapsed
+            self.routed.update(subsystems)
+        else:
+            self.ignored += 1
+            self.ignored_time += elapsed
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get routing statistics"""
+        return {
+            "routed_channels": len(self._routes),
+            "routed_messages": self.routed_messages,
+            "ignored_messages": self.ignored,
+            "avg_routed_us": (self.routed_time / self.routed_messages * 1e6) if self.routed_messages else 0.0,
+            "avg_ignored_us": (self.ignored_time / self.ignored * 1e6) if self.ignored else 0.0,
+            **{f"to_{name}": count for name, count in sorted(self.routed.items())},
+        }
+
+# Global instance
+channel_router = ChannelRouter()
@@ -0,0 +1,259 @@
+"""
+Per-guild configuration store
+Persists guild overrides in SQLite and serves precompiled views from an in-memory cache
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional
+import config
+
+# Settings that can be overridden per guild (anything not overridden falls back to config.py)
+SETTING_KEYS = {"city_roles", "country_roles", "leader_roles", "locations", "dos_protection", "channel_routing"}
+
+# Settings stored as a set of role names
+SET_SETTINGS = {"country_roles", "leader_roles", "locations"}
+
+@dataclass(frozen=True)
+class GuildConfigView:
+    """Read-only, precompiled configuration for a single guild"""
+    guild_id: Optional[int]
+    city_roles: Mapping[str, str]
+    city_role_names: FrozenSet[str]
+    country_roles: FrozenSet[str]
+    leader_roles: FrozenSet[str]
+    locations: FrozenSet[str]
+    combo_role_names: FrozenSet[str]
+    dos_protection: Mapping[str, Any]
+    channel_routing: Mapping[str, Any]
+
+def build_view(guild_id: Optional[int], overrides: Dict[str, Any]) -> GuildConfigView:
+    """
+    Compile a guild view from config.py defaults and stored overrides
+
+    Args:
+        guild_id: Discord guild ID (None for the global defaults)
+        overrides: Stored per-guild overrides keyed by setting name
+
+    Returns:
+        GuildConfigView: Precompiled view for the guild
+    """
+    city_roles = overrides.get("city_roles", config.CITY_ROLES)
+    locations = frozenset(overrides.get("locations", config.LOCATIONS))
+
+    # Without overrides the view tracks the live config dict, so runtime tweaks still apply
+    if "dos_protection" in overrides:
+        dos_settings = {**config.DOS_PROTECTION, **overrides["dos_protection"]}
+    else:
+        dos_settings = config.DOS_PROTECTION
+
+    routing = {**config.CHANNEL_ROUTING, **overrides.get("channel_routing", {})}
+
+    return GuildConfigView(
+        guild_id=guild_id,
+        city_roles=MappingProxyType(dict(city_roles)),
+        city_role_names=frozenset(city_roles.values()),
+        country_roles=frozenset(overrides.get("country_roles", config.COUNTRY_ROLES)),
+        leader_roles=frozenset(overrides.get("leader_roles", config.LEADER_ROLES)),
+        locations=locations,
+        combo_role_names=frozenset(f"{loc} Leader" for loc in locations),
+        dos_protection=MappingProxyType(dos_settings),
+        channel_routing=MappingProxyType({
+            "DEFAULT": frozenset(routing["DEFAULT"]),
+            "CHANNEL_NAMES": {name: frozenset(subs) for name, subs in routing["CHANNEL_NAMES"].items()},
+            "CHANNEL_NAME_RULES": {name: frozenset(subs) for name, subs in routing["CHANNEL_NAME_RULES"].items()},
+            "CATEGORY_RULES": {name: frozenset(subs) for name, subs in routing["CATEGORY_RULES"].items()},
+            "CHANNEL_OVERRIDES": {int(cid): frozenset(subs) for cid, subs in routing["CHANNEL_OVERRIDES"].items()},
+        }),
+    )
+
+class GuildConfigStore:
+    """SQLite-backed guild configuration with a guild-keyed read-through cache"""
+
+    def __init__(self, db_path: str = config.GUILD_CONFIG_DB):
+        self.logger = logging.getLogger(__name__)
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._cache: Dict[Optional[int], GuildConfigView] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._listeners: List[Callable[[Optional[int]], None]] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use and make sure the schema exists"""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS guild_settings ("
+                "guild_id INTEGER NOT NULL, "
+                "key TEXT NOT NULL, "
+                "value TEXT NOT NULL, "
+                "PRIMARY KEY (guild_id, key))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_overrides(self, guild_id: int) -> Dict[str, Any]:
+        """Load the raw overrides stored for a guild"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT key, value FROM guild_settings WHERE guild_id = ?", (guild_id,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def get(self, guild_id: Optional[int]) -> GuildConfigView:
+        """
+        Get the compiled configuration view for a guild
+
+        Args:
+            guild_id: Discord guild ID, or None for the global defaults
+
+        Returns:
+            GuildConfigView: Cached view for the guild
+        """
+        view = self._cache.get(guild_id)
+        if view is not None:
+            self.cache_hits += 1
+            return view
+
+        self.cache_misses += 1
+        overrides: Dict[str, Any] = {}
+        if guild_id is not None:
+            try:
+                overrides = self.get_overrides(guild_id)
+            except sqlite3.Error as e:
+                self.logger.error(f"Failed to load config for guild {guild_id}, using defaults: {e}")
+        view = build_view(guild_id, overrides)
+        self._cache[guild_id] = view
+        return view
+
+    def add_listener(self, callback: Callable[[Optional[int]], None]) -> None:
+        """Register a callback run with the guild ID (or None for all guilds) whenever views are invalidated"""
+        self._listeners.append(callback)
+
+    def invalidate(self, guild_id: Optional[int] = None) -> None:
+        """Drop cached views for one guild, or for every guild if no ID is given"""
+        if guild_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(guild_id, None)
+        for callback in self._listeners:
+            try:
+                callback(guild_id)
+            except Exception as e:
+                self.logger.error(f"Config change listener failed: {e}")
+
+    def set(self, guild_id: int, key: str, value: Any) -> None:
+        """
+        Store an override for a guild and invalidate its cached view
+
+        Args:
+            guild_id: Discord guild ID
+            key: Setting name (see SETTING_KEYS)
+            value: JSON-serialisable setting value
+        """
+        if key not in SETTING_KEYS:
+            raise KeyError(f"Unknown guild setting: {key}")
+        if key in SET_SETTINGS:
+            value = sorted(value)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO guild_settings (guild_id, key, value) VALUES (?, ?, ?)",
+                (guild_id, key, json.dumps(value))
+            )
+            conn.commit()
+        self.invalidate(guild_id)
+        self.logger.info(f"Updated '{key}' for guild {guild_id}")
+
+    def reset(self, guild_id: int, key: Optional[str] = None) -> None:
+        """Remove one override (or all overrides) for a guild, falling back to config.py"""
+        with self._lock:
+            conn = self._connect()
+            if key is None:
+                conn.execute("DELETE FROM guild_settings WHERE guild_id = ?", (guild_id,))
+            else:
+                conn.execute("DELETE FROM guild_settings WHERE guild_id = ? AND key = ?", (guild_id, key))
+            conn.commit()
+        self.invalidate(guild_id)
+        self.logger.info(f"Reset {key or 'all settings'} for guild {guild_id}")
+
+    def set_city_role(self, guild_id: int, keyword: str, role_name: str) -> None:
+        """Map a city keyword to a role name for a guild"""
+        city_roles = dict(self.get(guild_id).city_roles)
+        city_roles[keyword.strip().lower()] = role_name
+        self.set(guild_id, "city_roles", city_roles)
+
+    def remove_city_role(self, guild_id: int, keyword: str) -> bool:
+        """Remove a city keyword for a guild. Returns False if it wasn't configured"""
+        city_roles = dict(self.get(guild_id).city_roles)
+        if city_roles.pop(keyword.strip().lower(), None) is None:
+            return False
+        self.set(guild_id, "city_roles", city_roles)
+        return True
+
+    def add_role_name(self, guild_id: int, key: str, role_name: str) -> None:
+        """Add a role name to one of the set-valued settings for a guild"""
+        if key not in SET_SETTINGS:
+            raise KeyError(f"Setting '{key}' is not a role list")
+        names = set(getattr(self.get(guild_id), key))
+        names.add(role_name)
+        self.set(guild_id, key, names)
+
+    def remove_role_name(self, guild_id: int, key: str, role_name: str) -> bool:
+        """Remove a role name from a set-valued setting. Returns False if it wasn't present"""
+        if key not in SET_SETTINGS:
+            raise KeyError(f"Setting '{key}' is not a role list")
+        names = set(getattr(self.get(guild_id), key))
+        if role_name not in names:
+            return False
+        names.discard(role_name)
+        self.set(guild_id, key, names)
+        return True
+
+    def set_dos_value(self, guild_id: int, setting: str, value: int) -> None:
+        """Override a single DOS_PROTECTION value for a guild"""
+        if setting not in config.DOS_PROTECTION or isinstance(config.DOS_PROTECTION[setting], dict):
+            raise KeyError(f"Unknown DoS protection setting: {setting}")
+        if value < 1:
+            # A zero limit would rate-limit everyone, and a zero or negative window breaks the window check
+            raise ValueError(f"DoS protection values must be at least 1, got {value}")
+        dos_overrides = self.get_overrides(guild_id).get("dos_protection", {})
+        dos_overrides[setting] = value
+        self.set(guild_id, "dos_protection", dos_overrides)
+
+    def set_channel_route(self, guild_id: int, channel_id: int, subsystems: Optional[List[str]]) -> None:
+        """Pin the subsystems for one channel, or clear the pin when subsystems is None"""
+        routing = self.get_overrides(guild_id).get("channel_routing", {})
+        channel_overrides = dict(routing.get("CHANNEL_OVERRIDES", {}))
+        if subsystems is None:
+            channel_overrides.pop(str(channel_id), None)
+        else:
+            channel_overrides[str(channel_id)] = sorted(subsystems)
+        routing["CHANNEL_OVERRIDES"] = channel_overrides
+        self.set(guild_id, "channel_routing", routing)
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Get statistics about the configuration cache"""
+        return {
+            "cached_guilds": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+# Global instance
+guild_config = GuildConfigStore()
+
+# Convenience functions
+def get_guild_config(guild_id: Optional[int]) -> GuildConfigView:
+    """Get the compiled configuration view for a guild"""
+    return guild_config.get(guild_id)
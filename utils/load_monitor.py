@@ -0,0 +1,165 @@
+"""
+Event loop load monitor
+Samples event loop lag and task backlog, and moves the bot through load levels that shed
+optional work under pressure and recover automatically
+"""
+
+import math
+import time
+import asyncio
+import logging
+from enum import IntEnum
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+import config
+
+class LoadLevel(IntEnum):
+    """Load levels, from normal operation to heavily degraded"""
+    NORMAL = 0
+    ELEVATED = 1   # skip cosmetic warning notices
+    HIGH = 2       # also defer combo role reconciliation and review-channel posts
+    CRITICAL = 3   # also tighten admission limits further
+
+def level_for(value: float, thresholds: List[float]) -> LoadLevel:
+    """Highest level whose threshold the value has reached"""
+    level = LoadLevel.NORMAL
+    for index, threshold in enumerate(thresholds, start=1):
+        if value >= threshold:
+            level = LoadLevel(index)
+    return level
+
+class LoadMonitor:
+    """Tracks loop lag and queue depth, and exposes the current degradation policy"""
+
+    def __init__(self, settings: Optional[Mapping[str, Any]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.settings = settings if settings is not None else config.LOAD_MONITOR
+        self.level = LoadLevel.NORMAL
+        self.lag = 0.0
+        self.queue_depth = 0
+        self.level_since = time.monotonic()
+        self.time_in_level: Dict[LoadLevel, float] = {level: 0.0 for level in LoadLevel}
+        self.transitions = 0
+        self._calm_samples = 0
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[LoadLevel, LoadLevel], None]] = []
+        self._scaled: Optional[Tuple[Mapping[str, Any], LoadLevel, Mapping[str, Any]]] = None
+
+    def start(self) -> None:
+        """Start sampling on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def add_listener(self, callback: Callable[[LoadLevel, LoadLevel], None]) -> None:
+        """Register a callback run with (old_level, new_level) on every level change"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[LoadLevel, LoadLevel], None]) -> None:
+        """Unregister a level change callback"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    async def _run(self) -> None:
+        """Measure how late the loop wakes us up, once per sample interval"""
+        loop = asyncio.get_running_loop()
+        interval = self.settings["SAMPLE_INTERVAL"]
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(loop.time() - started - interval, 0.0)
+            self.record_sample(lag, len(asyncio.all_tasks()))
+
+    def record_sample(self, lag: float, queue_depth: int) -> None:
+        """
+        Update the load level from one sample
+
+        Levels rise as soon as a sample crosses a threshold, and drop one step at a time
+        after RECOVERY_SAMPLES consecutive calmer samples.
+
+        Args:
+            lag: Seconds the loop was late waking the sampler
+            queue_depth: Number of pending tasks on the loop
+        """
+        self.lag = lag
+        self.queue_depth = queue_depth
+        target = max(
+            level_for(lag, self.settings["LAG_THRESHOLDS"]),
+            level_for(queue_depth, self.settings["QUEUE_THRESHOLDS"]),
+        )
+
+        if target > self.level:
+            self._calm_samples = 0
+            self._set_level(target)
+        elif target < self.level:
+            self._calm_samples += 1
+            if self._calm_samples >= self.settings["RECOVERY_SAMPLES"]:
+                self._calm_samples = 0
+                self._set_level(LoadLevel(self.level - 1))
+        else:
+            self._calm_samples = 0
+
+    def _set_level(self, level: LoadLevel) -> None:
+        """Switch level, accounting time spent and notifying listeners"""
+        now = time.monotonic()
+        old = self.level
+        self.time_in_level[old] += now - self.level_since
+        self.level_since = now
+        self.level = level
+        self.transitions += 1
+        log = self.logger.warning if level > old else self.logger.info
+        log(f"Load level {old.name} -> {level.name} (loop lag {self.lag * 1000:.0f}ms, {self.queue_depth} tasks)")
+        for callback in self._listeners:
+            try:
+                callback(old, level)
+            except Exception as e:
+                self.logger.error(f"Load level listener failed: {e}")
+
+    # --- Degradation policy -------------------------------------------------
+
+    def allows_notices(self) -> bool:
+        """Whether cosmetic warning notices (rate limit / spam replies) should be sent"""
+        return self.level < LoadLevel.ELEVATED
+
+    def allows_review_posts(self) -> bool:
+        """Whether unrecognized cities should be posted to the review channel right away"""
+        return self.level < LoadLevel.HIGH
+
+    def defers_combo_updates(self) -> bool:
+        """Whether combo role reconciliation should wait until load drops"""
+        return self.level >= LoadLevel.HIGH
+
+    def apply_admission_limits(self, settings: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Scale the MAX_* limits in a DoS settings mapping down for the current load level (rounding up)"""
+        factor = self.settings["ADMISSION_FACTORS"][self.level]
+        if factor >= 1.0:
+            return settings
+        cached = self._scaled
+        if cached is not None and cached[0] is settings and cached[1] == self.level:
+            return cached[2]
+        scaled = {
+            key: max(1, math.ceil(value * factor)) if key.startswith("MAX_") and isinstance(value, int) else value
+            for key, value in settings.items()
+        }
+        self._scaled = (settings, self.level, MappingProxyType(scaled))
+        return self._scaled[2]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the current level, latest sample and time spent in each level"""
+        time_in_level = dict(self.time_in_level)
+        time_in_level[self.level] += time.monotonic() - self.level_since
+        return {
+            "level": self.level.name,
+            "lag_ms": self.lag * 1000,
+            "queue_depth": self.queue_depth,
+            "transitions": self.transitions,
+            "time_in_level": {level.name: seconds for level, seconds in time_in_level.items()},
+        }
+
+# Global instance
+load_monitor = LoadMonitor()
@@ -0,0 +1,417 @@
+"""
+Guild-wide raid detection
+Tracks normalized message fingerprints and per-channel rates in fixed-size count-min sketches,
+so coordinated raids from many accounts are caught without per-user memory
+"""
+
+import re
+import math
+import time
+import hashlib
+import logging
+import unicodedata
+from array import array
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
+import discord
+import config
+
+MENTION_PATTERN = re.compile(r"<(@[!&]?|#)\d+>")
+INVISIBLE_PATTERN = re.compile(r"[\u200b-\u200f\u2060\ufeff]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def normalize_message(content: str) -> str:
+    """
+    Normalize message content so trivial variations share a fingerprint
+
+    Args:
+        content: Raw message content
+
+    Returns:
+        str: Lowercased content with mentions, invisible characters and extra whitespace removed
+    """
+    text = unicodedata.normalize("NFKC", content).lower()
+    text = INVISIBLE_PATTERN.sub("", text)
+    text = MENTION_PATTERN.sub("@", text)
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+def sketch_indexes(key: str, width: int, depth: int) -> Tuple[int, ...]:
+    """
+    Cell indexes for a key in a width x depth sketch, using double hashing
+
+    Every sketch with the same dimensions shares these indexes, so they are computed once per key.
+    """
+    key_hash = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    h1 = key_hash & 0xFFFFFFFF
+    h2 = (key_hash >> 32) | 1
+    return tuple(row * width + (h1 + row * h2) % width for row in range(depth))
+
+class CountMinSketch:
+    """Fixed-size count-min sketch addressed by precomputed cell indexes"""
+
+    def __init__(self, width: int, depth: int):
+        self.width = width
+        self.depth = depth
+        self.table = array("I", bytes(4 * width * depth))
+
+    def add(self, indexes: Tuple[int, ...]) -> None:
+        """Increment a key's counters (conservative update: only those at the key's current minimum)"""
+        table = self.table
+        lowest = min([table[index] for index in indexes])
+        if lowest == 0xFFFFFFFF:
+            return
+        for index in indexes:
+            if table[index] == lowest:
+                table[index] = lowest + 1
+
+    def estimate(self, indexes: Tuple[int, ...]) -> int:
+        """Estimated count for a key (never an underestimate)"""
+        table = self.table
+        return min([table[index] for index in indexes])
+
+    def clear(self) -> None:
+        """Reset every counter"""
+        self.table = array("I", bytes(4 * self.width * self.depth))
+
+class WindowedSketch:
+    """Pair of count-min sketches approximating a sliding window of configurable length"""
+
+    def __init__(self, width: int, depth: int, window: float):
+        self.window = window
+        self.current = CountMinSketch(width, depth)
+        self.previous = CountMinSketch(width, depth)
+        self.window_start = 0.0
+
+    def rotate(self, now: float) -> bool:
+        """Move to a new window if the current one has expired. Returns True if it rotated"""
+        if now - self.window_start < self.window:
+            return False
+        if now - self.window_start < 2 * self.window:
+            self.current, self.previous = self.previous, self.current
+            self.current.clear()
+        else:
+            self.current.clear()
+            self.previous.clear()
+        self.window_start = now
+        return True
+
+    def add(self, indexes: Tuple[int, ...], now: float) -> float:
+        """Count a key and return its sliding-window estimate"""
+        self.current.add(indexes)
+        return self.estimate(indexes, now)
+
+    def estimate(self, indexes: Tuple[int, ...], now: float) -> float:
+        """Sliding-window estimate: the current window plus the unexpired share of the previous one"""
+        elapsed = min(max(now - self.window_start, 0.0) / self.window, 1.0)
+        return self.current.estimate(indexes) + self.previous.estimate(indexes) * (1.0 - elapsed)
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for a number of keys at a target false positive rate"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def indexes(self, key: str) -> Tuple[int, ...]:
+        """Bit indexes for a key, using double hashing"""
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest(), "little")
+        h1 = key_hash & 0xFFFFFFFFFFFFFFFF
+        h2 = (key_hash >> 64) | 1
+        return tuple((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def contains(self, indexes: Tuple[int, ...]) -> bool:
+        """Check if a key may have been added (false positives at about the configured rate)"""
+        bits = self.bits
+        return all(bits[index >> 3] & (1 << (index & 7)) for index in indexes)
+
+    def add(self, indexes: Tuple[int, ...]) -> None:
+        """Add a key"""
+        bits = self.bits
+        for index in indexes:
+            bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def clear(self) -> None:
+        """Remove every key"""
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+class WindowedBloomFilter:
+    """
+    "Seen this window?" test for (author, fingerprint) pairs
+
+    When the current filter reaches capacity it becomes the previous filter and is still checked
+    until the window ends, so the false positive rate stays near the configured one however
+    busy the guild gets.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = BloomFilter(capacity, error_rate)
+
+    def rotate(self) -> None:
+        """Start a new window"""
+        self.current.clear()
+        self.previous.clear()
+
+    def add(self, key: str) -> bool:
+        """Add a key. Returns True if it was not seen before this window"""
+        indexes = self.current.indexes(key)
+        if self.current.contains(indexes) or self.previous.contains(indexes):
+            return False
+        if self.current.count >= self.current.capacity:
+            self.current, self.previous = self.previous, self.current
+            self.current.clear()
+        self.current.add(indexes)
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.current.bits) + len(self.previous.bits)
+
+@dataclass
+class HeavyHitter:
+    """A frequently repeated fingerprint"""
+    sample: str
+    authors: float
+    messages: float
+
+@dataclass
+class GuildRaidState:
+    """Raid detection state for one guild; size is independent of member count"""
+    fingerprints: WindowedSketch
+    author_pairs: WindowedBloomFilter
+    authors: WindowedSketch
+    channels: WindowedSketch
+    top: Dict[Tuple[int, ...], HeavyHitter] = field(default_factory=dict)
+    top_floor: float = 0.0
+    raid_until: float = 0.0
+    raid_reason: str = ""
+    slowed_channels: Dict[int, int] = field(default_factory=dict)
+    raid_limits: Optional[Tuple[Mapping[str, Any], Mapping[str, Any]]] = None
+
+class RaidVerdict(NamedTuple):
+    """Result of observing one message"""
+    flagged: bool
+    triggered: bool
+    reason: str
+
+CLEAN = RaidVerdict(False, False, "")
+
+class RaidDetector:
+    """Guild-wide raid detector built on count-min sketches with heavy-hitter tracking"""
+
+    def __init__(self, settings: Optional[Mapping[str, Any]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.settings = settings if settings is not None else config.RAID_DETECTION
+        self.guilds: Dict[int, GuildRaidState] = {}
+        self.raids_triggered = 0
+
+    def _state(self, guild_id: int) -> GuildRaidState:
+        """Get or create the sketches for a guild"""
+        state = self.guilds.get(guild_id)
+        if state is None:
+            width = self.settings["SKETCH_WIDTH"]
+            depth = self.settings["SKETCH_DEPTH"]
+            window = self.settings["WINDOW"]
+            state = GuildRaidState(
+                fingerprints=WindowedSketch(width, depth, window),
+                author_pairs=WindowedBloomFilter(self.settings["PAIR_FILTER_CAPACITY"], self.settings["PAIR_FILTER_ERROR_RATE"]),
+                authors=WindowedSketch(width, depth, window),
+                channels=WindowedSketch(width, depth, window),
+            )
+            self.guilds[guild_id] = state
+        return state
+
+    def is_raid_mode(self, guild_id: Optional[int], now: Optional[float] = None) -> bool:
+        """Check if a guild is currently in raid mode"""
+        if guild_id is None:
+            return False
+        state = self.guilds.get(guild_id)
+        return state is not None and state.raid_until > (now if now is not None else time.time())
+
+    def _rotate(self, state: GuildRaidState, now: float) -> None:
+        """Rotate all sketches together and refresh heavy-hitter estimates"""
+        if not state.fingerprints.rotate(now):
+            return
+        state.author_pairs.rotate()
+        state.authors.rotate(now)
+        state.channels.rotate(now)
+        for fp_key in list(state.top):
+            hitter = state.top[fp_key]
+            hitter.authors = state.authors.estimate(fp_key, now)
+            hitter.messages = state.fingerprints.estimate(fp_key, now)
+            if hitter.messages < 1:
+                del state.top[fp_key]
+        state.top_floor = min((hitter.authors for hitter in state.top.values()), default=0.0)
+
+    def _indexes(self, key: str) -> Tuple[int, ...]:
+        """Sketch cell indexes for a key under the configured dimensions"""
+        return sketch_indexes(key, self.settings["SKETCH_WIDTH"], self.settings["SKETCH_DEPTH"])
+
+    def _track_heavy_hitter(self, state: GuildRaidState, fp_key: Tuple[int, ...], text: str, authors: float, messages: float) -> None:
+        """Keep the top-N fingerprints by distinct authors in a fixed-size table"""
+        hitter = state.top.get(fp_key)
+        if hitter is not None:
+            hitter.authors = authors
+            hitter.messages = messages
+            return
+        if len(state.top) < self.settings["TOP_FINGERPRINTS"]:
+            state.top[fp_key] = HeavyHitter(text[:80], authors, messages)
+            return
+        # Most messages are one-offs; skip the scan unless this one could displace an entry
+        if authors <= state.top_floor:
+            return
+        weakest = min(state.top, key=lambda key: (state.top[key].authors, state.top[key].messages))
+        if authors > state.top[weakest].authors:
+            del state.top[weakest]
+            state.top[fp_key] = HeavyHitter(text[:80], authors, messages)
+        state.top_floor = min(hitter.authors for hitter in state.top.values())
+
+    def observe(self, guild_id: int, channel_id: int, author_id: int, content: str, now: Optional[float] = None,
+                fingerprint: Optional[str] = None, watch_rate: bool = True) -> RaidVerdict:
+        """
+        Record a message and check it against guild-wide raid thresholds
+
+        Args:
+            guild_id: Discord guild ID
+            channel_id: Discord channel ID
+            author_id: Discord user ID
+            content: Message content
+            now: Current time (defaults to time.time())
+            fingerprint: Normalized content computed elsewhere (e.g. off the event loop);
+                         content is normalized here when omitted
+            watch_rate: Whether channel volume alone can trigger raid mode; off for channels
+                        where bursts are expected, like city selection during an onboarding wave
+
+        Returns:
+            RaidVerdict: flagged if the message is part of an active raid,
+                         triggered if it pushed the guild over a raid threshold
+        """
+        now = now if now is not None else time.time()
+        state = self._state(guild_id)
+        self._rotate(state, now)
+
+        reason = ""
+        channel_rate = state.channels.add(self._indexes(f"c:{channel_id}"), now)
+        if watch_rate and channel_rate >= self.settings["CHANNEL_RATE_THRESHOLD"]:
+            reason = f"channel <#{channel_id}> at {channel_rate:.0f} messages per {self.settings['WINDOW']}s"
+
+        flagged = False
+        text = fingerprint if fingerprint is not None else normalize_message(content)
+        if len(text) >= self.settings["MIN_FINGERPRINT_LENGTH"]:
+            fp_key = self._indexes(text)
+            messages = state.fingerprints.add(fp_key, now)
+
+            # Count each author once per fingerprint per window
+            if state.author_pairs.add(f"{author_id}:{text}"):
+                authors = state.authors.add(fp_key, now)
+            else:
+                authors = state.authors.estimate(fp_key, now)
+
+            self._track_heavy_hitter(state, fp_key, text, authors, messages)
+            if authors >= self.settings["DISTINCT_AUTHORS_THRESHOLD"]:
+                flagged = True
+                reason = reason or f"{authors:.0f} accounts posted '{text[:40]}'"
+
+        raid_active = state.raid_until > now
+        if raid_active and reason:
+            # Raid traffic is still arriving; keep raid mode on
+            state.raid_until = now + self.settings["RAID_MODE_DURATION"]
+        triggered = bool(reason) and (not raid_active or channel_id not in state.slowed_channels)
+        if not raid_active and not triggered:
+            return CLEAN
+        return RaidVerdict(flagged, triggered, reason)
+
+    async def enter_raid_mode(self, guild: discord.Guild, channel: Optional[discord.abc.GuildChannel], reason: str) -> None:
+        """
+        Start (or extend) raid mode: slow the channel down and tighten DoS limits
+
+        Args:
+            guild: Guild under raid
+            channel: Channel to apply slowmode to
+            reason: Why raid mode was triggered
+        """
+        state = self._state(guild.id)
+        now = time.time()
+        if state.raid_until <= now:
+            self.raids_triggered += 1
+            state.raid_reason = reason
+            self.logger.warning(f"Raid mode enabled in guild '{guild.name}': {reason}")
+        state.raid_until = now + self.settings["RAID_MODE_DURATION"]
+
+        if isinstance(channel, discord.TextChannel) and channel.id not in state.slowed_channels:
+            state.slowed_channels[channel.id] = channel.slowmode_delay
+            slowmode = self.settings["RAID_SLOWMODE_SECONDS"]
+            if channel.slowmode_delay < slowmode:
+                try:
+                    await channel.edit(slowmode_delay=slowmode, reason=f"Raid mode: {reason}")
+                except discord.Forbidden:
+                    self.logger.warning(f"Cannot set slowmode in channel '{channel.name}'.")
+                except discord.HTTPException as e:
+                    self.logger.warning(f"Failed to set slowmode in channel '{channel.name}': {e}")
+
+    async def exit_raid_mode(self, guild: discord.Guild) -> None:
+        """End raid mode for a guild and restore the previous slowmode settings"""
+        state = self.guilds.get(guild.id)
+        if state is None:
+            return
+        state.raid_until = 0.0
+        state.raid_limits = None
+        for channel_id, previous in state.slowed_channels.items():
+            channel = guild.get_channel(channel_id)
+            if isinstance(channel, discord.TextChannel):
+                try:
+                    await channel.edit(slowmode_delay=previous, reason="Raid mode ended")
+                except discord.HTTPException as e:
+                    self.logger.warning(f"Failed to restore slowmode in channel '{channel.name}': {e}")
+        state.slowed_channels.clear()
+        self.logger.info(f"Raid mode ended in guild '{guild.name}'")
+
+    async def expire_raid_modes(self, guilds) -> None:
+        """Exit raid mode in any guild whose raid window has passed"""
+        now = time.time()
+        for guild in guilds:
+            state = self.guilds.get(guild.id)
+            if state is not None and state.raid_until and state.raid_until <= now:
+                await self.exit_raid_mode(guild)
+
+    def apply_raid_limits(self, guild_id: Optional[int], settings: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Overlay the stricter raid-mode limits on a guild's DoS settings while raid mode is active"""
+        if not self.is_raid_mode(guild_id):
+            return settings
+        state = self.guilds[guild_id]
+        if state.raid_limits is None or state.raid_limits[0] is not settings:
+            state.raid_limits = (settings, MappingProxyType({**settings, **self.settings["RAID_LIMITS"]}))
+        return state.raid_limits[1]
+
+    def get_top_fingerprints(self, guild_id: int, limit: int = 10) -> List[HeavyHitter]:
+        """Most repeated fingerprints in a guild, by distinct authors"""
+        state = self.guilds.get(guild_id)
+        if state is None:
+            return []
+        return sorted(state.top.values(), key=lambda hitter: (hitter.authors, hitter.messages), reverse=True)[:limit]
+
+    def get_raid_stats(self, guild_id: int) -> Dict[str, Any]:
+        """Get raid detection statistics for a guild"""
+        state = self.guilds.get(guild_id)
+        now = time.time()
+        active = state is not None and state.raid_until > now
+        return {
+            "raid_mode": active,
+            "raid_reason": state.raid_reason if active else "",
+            "raid_remaining_s": int(state.raid_until - now) if active else 0,
+            "slowed_channels": len(state.slowed_channels) if state else 0,
+            "raids_triggered": self.raids_triggered,
+            "sketch_bytes": sum(
+                sketch.current.table.itemsize * len(sketch.current.table) * 2
+                for sketch in (state.fingerprints, state.authors, state.channels)
+            ) + state.author_pairs.nbytes if state else 0,
+        }
+
+# Global instance
+raid_detector = RaidDetector()
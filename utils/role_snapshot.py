@@ -0,0 +1,175 @@
+"""
+Persisted member role snapshot
+Keeps member ID -> role ID sets for managed guilds on disk, so role logic can run right after a
+restart instead of waiting for discord.py to re-chunk every guild
+"""
+
+import os
+import gzip
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import discord
+import config
+
+SNAPSHOT_VERSION = 1
+
+class RoleSnapshot:
+    """In-memory member role snapshot with compact gzip persistence"""
+
+    def __init__(self, path: str = config.ROLE_SNAPSHOT["PATH"]):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.guilds: Dict[int, Dict[int, FrozenSet[int]]] = {}
+        self.saved_at = 0.0
+        self.dirty = False
+        # Members share a handful of role combinations; store each distinct set once
+        self._interned: Dict[FrozenSet[int], FrozenSet[int]] = {}
+        # Members already compared against live data this session
+        self._verified: Set[Tuple[int, int]] = set()
+
+    def _intern(self, role_ids: Iterable[int]) -> FrozenSet[int]:
+        """Return the shared instance of a role ID set"""
+        role_set = frozenset(role_ids)
+        return self._interned.setdefault(role_set, role_set)
+
+    def load(self) -> bool:
+        """
+        Load the snapshot from disk
+
+        Returns:
+            bool: True if a snapshot was loaded
+        """
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as snapshot_file:
+                data = json.load(snapshot_file)
+        except FileNotFoundError:
+            self.logger.info(f"No role snapshot at {self.path}; starting empty")
+            return False
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Cannot read role snapshot {self.path}: {e}")
+            return False
+
+        if data.get("version") != SNAPSHOT_VERSION:
+            self.logger.warning(f"Ignoring role snapshot with unsupported version {data.get('version')}")
+            return False
+
+        self.guilds.clear()
+        self._interned.clear()
+        for guild_id, guild_data in data["guilds"].items():
+            role_sets = [self._intern(role_ids) for role_ids in guild_data["role_sets"]]
+            self.guilds[int(guild_id)] = {
+                member_id: role_sets[set_index] for member_id, set_index in guild_data["members"]
+            }
+        self.saved_at = data.get("saved_at", 0.0)
+        members = sum(len(members) for members in self.guilds.values())
+        self.logger.info(f"Loaded role snapshot: {members} members in {len(self.guilds)} guild(s), "
+                         f"{len(self._interned)} distinct role sets")
+        return True
+
+    def _serialize(self) -> dict:
+        """Build the on-disk form: a role-set table per guild plus (member, set index) pairs"""
+        guilds = {}
+        for guild_id, members in self.guilds.items():
+            set_indexes: Dict[FrozenSet[int], int] = {}
+            pairs: List[List[int]] = []
+            for member_id, role_set in members.items():
+                index = set_indexes.setdefault(role_set, len(set_indexes))
+                pairs.append([member_id, index])
+            guilds[str(guild_id)] = {
+                "role_sets": [sorted(role_set) for role_set in set_indexes],
+                "members": pairs,
+            }
+        return {"version": SNAPSHOT_VERSION, "saved_at": time.time(), "guilds": guilds}
+
+    def _write(self, data: dict) -> None:
+        """Write the snapshot atomically"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as snapshot_file:
+            json.dump(data, snapshot_file, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    async def save(self) -> None:
+        """Write the snapshot to disk if it changed, off the event loop"""
+        if not self.dirty:
+            return
+        data = self._serialize()
+        self.dirty = False
+        try:
+            await asyncio.to_thread(self._write, data)
+            self.saved_at = data["saved_at"]
+        except OSError as e:
+            self.dirty = True
+            self.logger.error(f"Cannot write role snapshot {self.path}: {e}")
+
+    def get_roles(self, guild_id: int, member_id: int) -> Optional[FrozenSet[int]]:
+        """Snapshot role IDs for a member, or None if the member isn't in the snapshot"""
+        return self.guilds.get(guild_id, {}).get(member_id)
+
+    def get_members(self, guild_id: int) -> Dict[int, FrozenSet[int]]:
+        """All snapshot members of a guild"""
+        return self.guilds.get(guild_id, {})
+
+    def set_roles(self, guild_id: int, member_id: int, role_ids: Iterable[int]) -> None:
+        """Record a member's roles by ID (for changes made without a Member object)"""
+        role_set = self._intern(role_ids)
+        members = self.guilds.setdefault(guild_id, {})
+        if members.get(member_id) is not role_set:
+            members[member_id] = role_set
+            self.dirty = True
+
+    def update_member(self, member: discord.Member) -> None:
+        """Record a member's current live roles"""
+        self.set_roles(member.guild.id, member.id, (role.id for role in member.roles if not role.is_default()))
+        self._verified.add((member.guild.id, member.id))
+
+    def remove_member(self, guild_id: int, member_id: int) -> None:
+        """Forget a member who left the guild"""
+        if self.guilds.get(guild_id, {}).pop(member_id, None) is not None:
+            self.dirty = True
+        self._verified.discard((guild_id, member_id))
+
+    def remove_guild(self, guild_id: int) -> None:
+        """Forget a guild the bot left"""
+        if self.guilds.pop(guild_id, None) is not None:
+            self.dirty = True
+        self._verified = {key for key in self._verified if key[0] != guild_id}
+
+    def verify(self, member: discord.Member) -> Optional[FrozenSet[int]]:
+        """
+        Compare a member's live roles with the snapshot the first time they show up this session
+
+        Args:
+            member: Member with live role data
+
+        Returns:
+            Optional[FrozenSet[int]]: The stale snapshot roles if they changed while the bot was
+                                      offline, otherwise None
+        """
+        key = (member.guild.id, member.id)
+        if key in self._verified:
+            return None
+        previous = self.get_roles(*key)
+        self.update_member(member)
+        current = self.get_roles(*key)
+        if previous is not None and previous != current:
+            return previous
+        return None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get snapshot statistics"""
+        return {
+            "guilds": len(self.guilds),
+            "members": sum(len(members) for members in self.guilds.values()),
+            "distinct_role_sets": len(self._interned),
+            "verified_members": len(self._verified),
+            "saved_seconds_ago": int(time.time() - self.saved_at) if self.saved_at else -1,
+        }
+
+# Global instance
+role_snapshot = RoleSnapshot()
@@ -0,0 +1,174 @@
+"""
+Runtime speed profile
+Opt-in faster event loop, JSON backend and gateway decompression, each used only when its
+package is installed
+"""
+
+import zlib
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import discord
+import config
+
+DEFAULT = "default"
+SPEED = "speed"
+PROFILES = (DEFAULT, SPEED)
+
+ZLIB_SUFFIX = b"\x00\x00\xff\xff"
+
+class FastZlibDecompressionContext:
+    """
+    zlib-stream gateway decompressor with less copying than discord.py's
+
+    Almost every gateway message arrives in a single frame, so frames are decompressed
+    directly instead of being copied through a buffer first, and the result is handed to the
+    JSON backend as bytes (every supported backend parses bytes, skipping a UTF-8 decode pass).
+    With debug events enabled, messages are decoded to str first so socket_raw_receive
+    listeners still get text.
+    """
+    __slots__ = ("context", "pending")
+
+    COMPRESSION_TYPE: str = "zlib-stream"
+    decode_text: bool = False
+
+    def __init__(self) -> None:
+        self.context = zlib.decompressobj()
+        self.pending: List[bytes] = []
+
+    def decompress(self, data: bytes, /) -> Optional[bytes]:
+        # Messages end with a Z_SYNC_FLUSH marker; anything else is a partial message
+        if data[-4:] != ZLIB_SUFFIX:
+            self.pending.append(data)
+            return None
+        if self.pending:
+            self.pending.append(data)
+            data = b"".join(self.pending)
+            self.pending = []
+        message = self.context.decompress(data)
+        return message.decode("utf-8") if self.decode_text else message
+
+def json_backends() -> List[Tuple[str, Callable[[], Tuple[Callable[[Any], Any], Callable[[Any], str]]]]]:
+    """Fast JSON backends in order of preference, as (name, loader returning (loads, dumps))"""
+    def load_orjson():
+        import orjson
+        return orjson.loads, lambda obj: orjson.dumps(obj).decode("utf-8")
+
+    def load_msgspec():
+        import msgspec
+        return msgspec.json.decode, lambda obj: msgspec.json.encode(obj).decode("utf-8")
+
+    def load_ujson():
+        import ujson
+        return ujson.loads, lambda obj: ujson.dumps(obj, ensure_ascii=True)
+
+    return [("orjson", load_orjson), ("msgspec", load_msgspec), ("ujson", load_ujson)]
+
+class RuntimeProfile:
+    """Applies a runtime profile and remembers which backends ended up active"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.name = DEFAULT
+        self.event_loop = "asyncio"
+        self.json = "orjson" if getattr(discord.utils, "HAS_ORJSON", False) else "json"
+        # discord.py before 2.5 has no pluggable gateway decompressor
+        active = getattr(discord.utils, "_ActiveDecompressionContext", None)
+        self.gateway_compression = active.COMPRESSION_TYPE if active is not None else "zlib-stream"
+        self.missing: List[str] = []
+
+    def select(self, secrets: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Pick the profile name: the secrets TOML [runtime] profile wins over config.RUNTIME
+
+        Args:
+            secrets: Parsed secrets TOML, if loaded
+
+        Returns:
+            str: Profile name (unknown names fall back to the default profile)
+        """
+        name = config.RUNTIME["PROFILE"]
+        if secrets and isinstance(secrets.get("runtime"), dict):
+            name = secrets["runtime"].get("profile", name)
+        if name not in PROFILES:
+            self.logger.warning(f"Unknown runtime profile '{name}'; using '{DEFAULT}'")
+            return DEFAULT
+        return name
+
+    def apply(self, name: str, debug_events: bool = False) -> Dict[str, str]:
+        """
+        Apply a profile. Must run before the bot's event loop is created.
+
+        Args:
+            name: Profile name from select()
+            debug_events: Whether the bot is created with enable_debug_events (socket_raw_receive
+                          listeners then get decoded text from the tuned decompressor)
+
+        Returns:
+            Dict[str, str]: Active backends
+        """
+        self.name = name
+        if name == SPEED:
+            self._use_uvloop()
+            self._use_fast_json()
+            self._use_fast_zlib(debug_events)
+        backends = self.get_backends()
+        summary = ", ".join(f"{key}={value}" for key, value in backends.items())
+        self.logger.info(f"Runtime profile '{name}': {summary}")
+        if self.missing:
+            self.logger.info(f"Speed profile backends not installed: {', '.join(self.missing)}")
+        return backends
+
+    def _use_uvloop(self) -> None:
+        try:
+            import uvloop
+        except ImportError:
+            self.missing.append("uvloop")
+            return
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        self.event_loop = "uvloop"
+
+    def _use_fast_json(self) -> None:
+        # discord.py already picks orjson up on its own when it's installed
+        if getattr(discord.utils, "HAS_ORJSON", False):
+            self.json = "orjson"
+            return
+        for name, load in json_backends():
+            try:
+                loads, dumps = load()
+            except ImportError:
+                continue
+            discord.utils._from_json = loads
+            discord.utils._to_json = dumps
+            self.json = name
+            return
+        self.missing.append("orjson")
+
+    def _use_fast_zlib(self, debug_events: bool) -> None:
+        active = getattr(discord.utils, "_ActiveDecompressionContext", None)
+        if active is None:
+            self.logger.info("Tuned zlib decompressor needs discord.py 2.5 or newer; skipping")
+            return
+        # zstd-stream (used when zstandard is installed) is already faster; leave it alone
+        if active.COMPRESSION_TYPE != "zlib-stream":
+            return
+        FastZlibDecompressionContext.decode_text = debug_events
+        discord.utils._ActiveDecompressionContext = FastZlibDecompressionContext
+        self.gateway_compression = "zlib-stream (tuned)"
+
+    def get_backends(self) -> Dict[str, str]:
+        """Get the active event loop, JSON and gateway compression backends"""
+        try:
+            loop = asyncio.get_running_loop()
+            self.event_loop = "uvloop" if type(loop).__module__.startswith("uvloop") else "asyncio"
+        except RuntimeError:
+            pass
+        return {
+            "profile": self.name,
+            "event_loop": self.event_loop,
+            "json": self.json,
+            "gateway_compression": self.gateway_compression,
+        }
+
+# Global instance
+runtime_profile = RuntimeProfile()